@@ -2,19 +2,18 @@ from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
-from sqlalchemy.engine import URL
 
 from alembic import context
 from app.models import Base  # Import your models to ensure they are registered with SQLAlchemy
-from app.config import settings
+from app.database import SQLITE, database_url
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
-# Build the connection string with SSL
-connection_string = f"postgresql://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}?sslmode=require"
-config.set_main_option("sqlalchemy.url", connection_string)
+# Same URL as the app (DATABASE_DRIVER_NAME); "%" is escaped for the ini interpolation
+connection_string = database_url().render_as_string(hide_password=False)
+config.set_main_option("sqlalchemy.url", connection_string.replace("%", "%%"))
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
@@ -51,6 +50,8 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        # SQLite can't ALTER most things in place; batch mode recreates the table
+        render_as_batch=SQLITE,
     )
 
     with context.begin_transaction():
@@ -72,7 +73,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            render_as_batch=SQLITE,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,28 @@
+"""add users registration_date index
+
+Revision ID: 15d3f660d2b7
+Revises: 53ce38bfed4f
+Create Date: 2026-10-18 19:05:12.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '15d3f660d2b7'
+down_revision: Union[str, Sequence[str], None] = '53ce38bfed4f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_users_registration_date_id', 'users', ['registration_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_registration_date_id', table_name='users')
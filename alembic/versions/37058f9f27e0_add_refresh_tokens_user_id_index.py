@@ -0,0 +1,28 @@
+"""add refresh_tokens user_id index
+
+Revision ID: 37058f9f27e0
+Revises: c77d648d9708
+Create Date: 2026-10-18 20:12:03.554721
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '37058f9f27e0'
+down_revision: Union[str, Sequence[str], None] = 'c77d648d9708'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_refresh_tokens_user_id'), 'refresh_tokens', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_refresh_tokens_user_id'), table_name='refresh_tokens')
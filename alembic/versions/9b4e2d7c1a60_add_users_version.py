@@ -0,0 +1,28 @@
+"""add users version
+
+Revision ID: 9b4e2d7c1a60
+Revises: 37058f9f27e0
+Create Date: 2026-10-18 22:41:09.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4e2d7c1a60'
+down_revision: Union[str, Sequence[str], None] = '37058f9f27e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'version')
@@ -0,0 +1,33 @@
+"""add users donor search index
+
+Revision ID: c77d648d9708
+Revises: 15d3f660d2b7
+Create Date: 2026-10-18 19:31:47.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c77d648d9708'
+down_revision: Union[str, Sequence[str], None] = '15d3f660d2b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_users_blood_group_city_last_donation',
+        'users',
+        ['blood_group', sa.text('lower(city)'), 'last_donation_date'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_blood_group_city_last_donation', table_name='users')
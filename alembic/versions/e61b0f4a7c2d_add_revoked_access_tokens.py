@@ -0,0 +1,37 @@
+"""add revoked_access_tokens
+
+Revision ID: e61b0f4a7c2d
+Revises: d3a8f61c0b95
+Create Date: 2026-10-19 14:21:08.310472
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e61b0f4a7c2d'
+down_revision: Union[str, Sequence[str], None] = 'd3a8f61c0b95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('revoked_access_tokens',
+    sa.Column('jti', sa.String(length=32), nullable=False),
+    sa.Column('expires_at', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.Column('revoked_at', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('jti')
+    )
+    op.create_index(op.f('ix_revoked_access_tokens_expires_at'), 'revoked_access_tokens', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_revoked_access_tokens_revoked_at'), 'revoked_access_tokens', ['revoked_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_revoked_access_tokens_revoked_at'), table_name='revoked_access_tokens')
+    op.drop_index(op.f('ix_revoked_access_tokens_expires_at'), table_name='revoked_access_tokens')
+    op.drop_table('revoked_access_tokens')
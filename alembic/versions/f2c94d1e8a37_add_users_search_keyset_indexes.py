@@ -0,0 +1,40 @@
+"""add users search keyset indexes
+
+Revision ID: f2c94d1e8a37
+Revises: e61b0f4a7c2d
+Create Date: 2026-10-19 15:07:52.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c94d1e8a37'
+down_revision: Union[str, Sequence[str], None] = 'e61b0f4a7c2d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_users_blood_group_city_registration',
+        'users',
+        ['blood_group', sa.text('lower(city)'), 'registration_date', 'id'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_users_blood_group_registration',
+        'users',
+        ['blood_group', 'registration_date', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_blood_group_registration', table_name='users')
+    op.drop_index('ix_users_blood_group_city_registration', table_name='users')
@@ -0,0 +1,19 @@
+"""Blood group constants and donation rules shared by validation, search and matching."""
+
+BLOOD_GROUPS = ("A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-")
+
+# Red cell compatibility: recipient group -> donor groups, best match first
+COMPATIBLE_DONORS = {
+    "O-": ("O-",),
+    "O+": ("O+", "O-"),
+    "A-": ("A-", "O-"),
+    "A+": ("A+", "A-", "O+", "O-"),
+    "B-": ("B-", "O-"),
+    "B+": ("B+", "B-", "O+", "O-"),
+    "AB-": ("AB-", "A-", "B-", "O-"),
+    "AB+": ("AB+", "AB-", "A+", "A-", "B+", "B-", "O+", "O-"),
+}
+
+# Minimum days between whole-blood donations
+DONATION_INTERVAL_DAYS = 90
+
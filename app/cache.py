@@ -0,0 +1,106 @@
+"""Small caches for hot lookups.
+
+``CacheBackend`` is the interface routes talk to. ``InMemoryTTLCache`` is the
+default, one per worker process; a shared store such as Redis can be plugged in
+by implementing ``_get``/``_set``/``delete``/``clear``. Values should be
+JSON-compatible so that any backend can store them.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional
+from . import metrics
+from .config import settings
+
+cache_hits_total = metrics.counter("cache_hits_total", "Cache lookups that found a value", ["cache"])
+cache_misses_total = metrics.counter("cache_misses_total", "Cache lookups that found nothing", ["cache"])
+
+
+class CacheBackend(ABC):
+    """Key/value cache with per-entry expiry and hit/miss counting."""
+
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._get(key)
+        if value is None:
+            cache_misses_total.inc(cache=self.name)
+        else:
+            cache_hits_total.inc(cache=self.name)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store ``value`` for ``ttl`` seconds (the cache default when omitted)."""
+        self._set(key, value, self.ttl if ttl is None else ttl)
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[Any]:
+        """The stored value, or None when missing or expired."""
+
+    @abstractmethod
+    def _set(self, key: str, value: Any, ttl: float):
+        """Store ``value`` for ``ttl`` seconds; a ttl <= 0 stores nothing."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+
+class InMemoryTTLCache(CacheBackend):
+    """Bounded LRU cache local to this process, with per-entry expiry."""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        super().__init__(name, ttl)
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def _set(self, key, value, ttl):
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Authenticated user lookups (keyed by user id), see routers/user.py
+user_cache: CacheBackend = InMemoryTTLCache(
+    "user", settings.user_cache_size, settings.user_cache_ttl_seconds)
+
+
+def set_user_cache(backend: CacheBackend):
+    """Swap the user cache backend, e.g. for a store shared by all workers."""
+    global user_cache
+    user_cache = backend
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import threading
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Fast-fail guard for a shared backend such as the database.
+
+    The breaker opens after ``failure_threshold`` consecutive failures. While
+    open, callers should fail immediately instead of waiting on timeouts;
+    ``monitor`` probes the backend in the background and closes the breaker
+    once a probe succeeds.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, probe_interval: float = 5.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.failures = 0
+        self.is_open = False
+        self._lock = threading.Lock()
+        self._state_gauge = metrics.gauge(
+            "circuit_breaker_open", "1 while the circuit breaker is open", ["name"])
+        self._opened_total = metrics.counter(
+            "circuit_breaker_opened_total", "Times the circuit breaker opened", ["name"])
+        self._state_gauge.set(0, name=name)
+
+    def record_success(self):
+        if self.failures or self.is_open:
+            with self._lock:
+                if self.is_open:
+                    logger.info(f"Circuit breaker '{self.name}' closed")
+                self.failures = 0
+                self.is_open = False
+                self._state_gauge.set(0, name=self.name)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if not self.is_open and self.failures >= self.failure_threshold:
+                self.is_open = True
+                self._opened_total.inc(name=self.name)
+                self._state_gauge.set(1, name=self.name)
+                logger.warning(
+                    f"Circuit breaker '{self.name}' opened after {self.failures} consecutive failures")
+
+    async def monitor(self, probe):
+        """Background task: while open, run ``await probe()`` every interval until it succeeds."""
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            if not self.is_open:
+                continue
+            try:
+                await probe()
+            except Exception as e:
+                logger.debug(f"Circuit breaker '{self.name}' probe failed: {e}")
+            else:
+                self.record_success()
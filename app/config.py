@@ -11,7 +11,94 @@ class Settings(BaseSettings):
     secret_key: str
     algorithm: str
     access_token_expire_minutes: int
-    
+    refresh_token_expire_days: int = 30
+    # How often expired refresh tokens are deleted
+    refresh_token_purge_interval_seconds: float = 3600
+    # How often each worker fetches access tokens revoked (logged out) on other workers
+    revoked_tokens_sync_seconds: float = 5
+
+    # Use SQLAlchemy's AsyncEngine (asyncpg) instead of psycopg2 in the threadpool
+    database_async_mode: bool = False
+
+    # Connection pool (per worker process)
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_timeout: float = 30
+    database_pool_recycle: int = 1800
+    # Server-side statement_timeout in milliseconds (0 keeps the server default)
+    database_statement_timeout_ms: int = 0
+    # Compatibility with PgBouncer/Supabase transaction pooling
+    database_pgbouncer_mode: bool = False
+
+    # Connection liveness: ping pooled connections only after this much idle time
+    database_ping_idle_seconds: float = 30
+    # Fast-fail with 503 after this many consecutive connection failures
+    database_breaker_failure_threshold: int = 5
+    database_breaker_probe_interval: float = 5
+    # Log statements slower than this many milliseconds (0 disables)
+    database_slow_query_ms: float = 500
+    # Read replicas: comma-separated postgresql:// URLs for read-only routes (empty = primary only)
+    database_replica_urls: str = ""
+    # Replicas lagging more than this are skipped; lag is re-measured at the health check interval
+    database_replica_max_lag_seconds: float = 5
+    # After a user writes, their reads go to the primary for this long (read-your-writes)
+    database_read_your_writes_seconds: float = 10
+    # SQLite (DATABASE_DRIVER_NAME=sqlite): memory-mapped I/O size and lock wait
+    sqlite_mmap_size: int = 268435456
+    sqlite_busy_timeout_ms: int = 5000
+    # Readiness: how often the background check pings the database, and how long it waits
+    health_check_interval_seconds: float = 5
+    health_check_timeout_seconds: float = 2
+
+    # Password hashing pool (bcrypt runs off the event loop)
+    password_hash_workers: int = 4
+    password_hash_max_queue: int = 64
+    # bcrypt cost factor; stored hashes with another cost are rehashed on the next login
+    bcrypt_rounds: int = 12
+    # When > 0, pick the cost at startup whose hash time is closest to this (overrides bcrypt_rounds)
+    bcrypt_target_ms: float = 0
+
+    # Token-bucket rate limits in requests per minute (bursts up to the same number; 0 disables)
+    login_rate_limit_per_ip: float = 30
+    login_rate_limit_per_identifier: float = 10
+    signup_rate_limit_per_ip: float = 10
+    bulk_import_rate_limit_per_key: float = 2
+    export_rate_limit_per_key: float = 6
+    rate_limit_store_size: int = 100000
+    # Take the client IP from the last X-Forwarded-For entry (only behind a trusted proxy)
+    rate_limit_trust_forwarded_for: bool = False
+
+    # Authenticated user lookups cached per worker (invalidated on profile update)
+    user_cache_size: int = 10000
+    user_cache_ttl_seconds: float = 60
+
+    # Verified JWTs cached per worker until they expire
+    token_cache_size: int = 10000
+    # Embed profile fields in access tokens so GET /users/me/profile needs no database
+    jwt_embed_profile: bool = False
+
+    # Request profiling: fraction of requests to profile, and/or a token that enables it
+    # per request via the X-Profile header (both off by default)
+    profiling_sample_rate: float = 0
+    profiling_header_token: str = ""
+    profiling_dir: str = "profiles"
+    # "cprofile" or "pyinstrument" (if installed)
+    profiling_format: str = "cprofile"
+
+    # In-memory donor matching index for GET /users/match (off: every match queries the database)
+    donor_index_enabled: bool = True
+    # How often the index fetches donors changed since its last check (picks up other workers' writes)
+    donor_index_refresh_seconds: float = 60
+    # How often every id/version is compared instead (catches deletes and rows without updated_at)
+    donor_index_full_check_seconds: float = 3600
+
+    # Largest spreadsheet accepted by POST /signup/bulk; every row is a bcrypt hash, and at
+    # the default cost with half of 4 hash workers 100 rows take about 15 seconds
+    bulk_import_max_rows: int = 100
+    # Comma-separated partner keys (blood banks, hospitals) accepted in X-API-Key by
+    # POST /signup/bulk and GET /users/export (empty disables both)
+    partner_api_keys: str = ""
+
     class Config:
         env_file = ".env"
 
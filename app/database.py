@@ -1,70 +1,639 @@
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import URL
-from sqlalchemy.exc import OperationalError
-import os
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy import URL, make_url
+from sqlalchemy.exc import DisconnectionError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+import asyncio
+import hashlib
+import hmac
+import logging
+import math
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Optional
 from dotenv import load_dotenv
-from fastapi import HTTPException
+from fastapi import Cookie, HTTPException, Response
+from starlette.concurrency import run_in_threadpool
+from app import metrics
 from app.config import settings
+from app.circuit_breaker import CircuitBreaker
+from app.replicas import ReplicaSet, read_routing_total
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
-# Import settings
-# from .config import settings
-
-# Database configuration - URL.create handles special characters automatically
-DATABASE_URL = URL.create(
-    drivername="postgresql+psycopg2",  # Specify the driver explicitly
-    username=settings.database_username,
-    password=settings.database_password,
-    host=settings.database_hostname,
-    port=int(settings.database_port),
-    database=settings.database_name,
-    query={"sslmode": "require"}  # Supabase requires SSL
-)
+SQLITE = settings.database_driver_name == "sqlite"
 
-# Create SQLAlchemy engine with SSL parameters
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"sslmode": "require"}
-)
 
-# Create SessionLocal class
+def database_url(async_driver: bool = False) -> URL:
+    """Connection URL for DATABASE_DRIVER_NAME ("postgresql", or "sqlite" for local runs)."""
+    if SQLITE:
+        # DATABASE_NAME is the database file
+        return URL.create("sqlite+aiosqlite" if async_driver else "sqlite", database=settings.database_name)
+    # Database configuration - URL.create handles special characters automatically
+    return URL.create(
+        drivername="postgresql+asyncpg" if async_driver else "postgresql+psycopg2",
+        username=settings.database_username,
+        password=settings.database_password,
+        host=settings.database_hostname,
+        port=int(settings.database_port),
+        database=settings.database_name,
+        # Supabase requires SSL; asyncpg takes it through connect_args rather than the query string
+        query={} if async_driver else {"sslmode": "require"},
+    )
+
+
+DATABASE_URL = database_url()
+ASYNC_DATABASE_URL = database_url(async_driver=True)
+
+pool_checkout_wait_seconds = metrics.histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0))
+pool_size_gauge = metrics.gauge("db_pool_size", "Configured pool size", ["engine"])
+pool_checked_out_gauge = metrics.gauge("db_pool_checked_out", "Connections currently in use", ["engine"])
+pool_overflow_gauge = metrics.gauge("db_pool_overflow", "Connections open beyond pool_size", ["engine"])
+query_duration_seconds = metrics.histogram(
+    "db_query_duration_seconds", "Time spent executing SQL statements", ["engine"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+slow_queries_total = metrics.counter(
+    "db_slow_queries_total", "Statements slower than DATABASE_SLOW_QUERY_MS", ["engine"])
+
+
+def _timed_pool(pool_class, name: str):
+    """Subclass a pool so that every checkout records how long it waited."""
+    class TimedPool(pool_class):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                pool_checkout_wait_seconds.observe(time.perf_counter() - started, engine=name)
+
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+
+def engine_options(async_driver: bool = False, name: str = "primary",
+                   pool_size: Optional[int] = None, max_overflow: Optional[int] = None) -> dict:
+    """Pool and connection options shared by the sync and async engines."""
+    if SQLITE:
+        connect_args = {}
+    else:
+        connect_args = {"ssl": "require"} if async_driver else {"sslmode": "require"}
+    options = {
+        "connect_args": connect_args,
+        "poolclass": _timed_pool(AsyncAdaptedQueuePool if async_driver else QueuePool, name),
+        "pool_size": settings.database_pool_size if pool_size is None else pool_size,
+        "max_overflow": settings.database_max_overflow if max_overflow is None else max_overflow,
+        "pool_timeout": settings.database_pool_timeout,
+        # Retire connections before Supabase/PgBouncer drops them server-side
+        "pool_recycle": settings.database_pool_recycle,
+    }
+
+    if SQLITE:
+        return options
+    if settings.database_pgbouncer_mode:
+        # Transaction pooling hands each transaction a different server connection,
+        # so prepared statements can't be cached and startup options aren't forwarded
+        if async_driver:
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+        if settings.database_statement_timeout_ms:
+            logger.warning(
+                "DATABASE_STATEMENT_TIMEOUT_MS is ignored in PgBouncer mode; "
+                "set statement_timeout on the database role instead")
+    elif settings.database_statement_timeout_ms:
+        timeout = str(settings.database_statement_timeout_ms)
+        if async_driver:
+            connect_args["server_settings"] = {"statement_timeout": timeout}
+        else:
+            connect_args["options"] = f"-c statement_timeout={timeout}"
+    return options
+
+
+def install_sqlite_pragmas(sync_engine, read_only: bool = False):
+    """Tune every new SQLite connection: WAL, NORMAL sync, mmap reads, a busy timeout."""
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers proceed while the writer commits; NORMAL is durable in WAL mode
+        # except for the last transactions on power loss
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        # Other worker processes have their own writer; wait for the lock instead of failing
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def _create_engines(async_driver: bool = False):
+    """(writer, reader) engines. They are the same engine except on SQLite."""
+    create = create_async_engine if async_driver else create_engine
+    url = ASYNC_DATABASE_URL if async_driver else DATABASE_URL
+    if not SQLITE:
+        writer = create(url, **engine_options(async_driver))
+        return writer, writer
+
+    # SQLite has a single writer: queue writes for one pooled connection instead of
+    # contending for the file lock, and serve reads from a separate pool
+    writer = create(url, **engine_options(async_driver, pool_size=1, max_overflow=0))
+    reader = create(url, **engine_options(async_driver, name="read"))
+    install_sqlite_pragmas(getattr(writer, "sync_engine", writer))
+    install_sqlite_pragmas(getattr(reader, "sync_engine", reader), read_only=True)
+    return writer, reader
+
+
+# Create SQLAlchemy engines (with SSL parameters on Postgres)
+engine, read_engine = _create_engines()
+
+# Create SessionLocal class (ReadSessionLocal for read-only work)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = SessionLocal
+if read_engine is not engine:
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Async engines and sessions, only built when async mode is enabled
+async_engine = async_read_engine = None
+AsyncSessionLocal = AsyncReadSessionLocal = None
+if settings.database_async_mode:
+    async_engine, async_read_engine = _create_engines(async_driver=True)
+    # Objects are read after commit when building responses, so don't expire them
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    AsyncReadSessionLocal = AsyncSessionLocal
+    if async_read_engine is not async_engine:
+        AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+
+
+def replica_url(url: str, async_driver: bool = False) -> URL:
+    """A replica's postgresql:// URL with the driver the engines use."""
+    url = make_url(url)
+    if async_driver:
+        return url.set(drivername="postgresql+asyncpg", query={})
+    return url.set(drivername="postgresql+psycopg2")
+
+
+# Read replicas (Postgres only), built for the active mode
+replica_engines = {}
+replica_sessions = {}
+_replica_urls = [url.strip() for url in settings.database_replica_urls.split(",") if url.strip()]
+if _replica_urls and SQLITE:
+    logger.warning("DATABASE_REPLICA_URLS is ignored with DATABASE_DRIVER_NAME=sqlite")
+    _replica_urls = []
+for number, url in enumerate(_replica_urls, start=1):
+    name = f"replica{number}"
+    if settings.database_async_mode:
+        replica_engines[name] = create_async_engine(
+            replica_url(url, async_driver=True), **engine_options(async_driver=True, name=name))
+        replica_sessions[name] = async_sessionmaker(
+            replica_engines[name], autoflush=False, expire_on_commit=False)
+    else:
+        replica_engines[name] = create_engine(replica_url(url), **engine_options(name=name))
+        replica_sessions[name] = sessionmaker(autocommit=False, autoflush=False, bind=replica_engines[name])
+
+replicas = ReplicaSet(replica_engines, settings.database_replica_max_lag_seconds)
+
+# Clients who wrote recently carry the write time in this signed cookie; their reads go
+# to the primary so they see their own changes, whichever worker serves them
+WRITE_COOKIE = "last_write"
+
+
+def _sign_write_time(written_at: str) -> str:
+    return hmac.new(settings.secret_key.encode(), f"{WRITE_COOKIE}:{written_at}".encode(),
+                    hashlib.sha256).hexdigest()
+
+
+def mark_recent_write(response: Response):
+    """Send this client's reads to the primary for DATABASE_READ_YOUR_WRITES_SECONDS."""
+    if not replicas:
+        return
+    written_at = f"{time.time():.3f}"
+    response.set_cookie(
+        WRITE_COOKIE, f"{written_at}.{_sign_write_time(written_at)}",
+        max_age=math.ceil(settings.database_read_your_writes_seconds),
+        # Sent with the frontend's cross-site, credentialed requests
+        httponly=True, secure=True, samesite="none",
+    )
+
+
+def wrote_recently(cookie: Optional[str]) -> bool:
+    """Whether ``cookie`` is a genuine write marker younger than DATABASE_READ_YOUR_WRITES_SECONDS."""
+    if not cookie:
+        return False
+    written_at, _, signature = cookie.rpartition(".")
+    if not hmac.compare_digest(signature.encode(), _sign_write_time(written_at).encode()):
+        return False
+    return time.time() - float(written_at) < settings.database_read_your_writes_seconds
+
+
+def _engines_in_use() -> dict:
+    """Engines serving requests, keyed by the name used in metrics."""
+    if async_engine is not None:
+        primary, read = async_engine, async_read_engine
+    else:
+        primary, read = engine, read_engine
+    engines = {"primary": primary}
+    if read is not primary:
+        engines["read"] = read
+    engines.update(replica_engines)
+    return engines
+
+
+def pool_status(pool) -> dict:
+    """Occupancy of a queue pool (empty for pools that don't track it)."""
+    if not isinstance(pool, QueuePool):
+        return {}
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
+
+
+def pool_statuses() -> dict:
+    """Occupancy of every engine's pool, keyed by engine name."""
+    return {name: pool_status(engine_.pool) for name, engine_ in _engines_in_use().items()}
+
+
+def _collect_pool_metrics():
+    for name, status in pool_statuses().items():
+        if status:
+            pool_size_gauge.set(status["size"], engine=name)
+            pool_checked_out_gauge.set(status["checked_out"], engine=name)
+            pool_overflow_gauge.set(status["overflow"], engine=name)
+
+
+metrics.add_collector(_collect_pool_metrics)
 
 # Create Base class
 Base = declarative_base()
 
-# Dependency to get database session
-def get_db():
-    """Get database session with error handling for connection failures."""
-    db = SessionLocal()
+
+def install_liveness_check(sync_engine, idle_seconds: float):
+    """Ping pooled connections on checkout, but only after they sat idle.
+
+    Connections that were used within ``idle_seconds`` are handed out without
+    a round trip; stale ones are pinged and replaced if the server dropped them.
+    """
+    @event.listens_for(sync_engine, "checkin")
+    def _record_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _ping_idle_connection(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        try:
+            sync_engine.dialect.do_ping(dbapi_connection)
+        except Exception:
+            # Tells the pool to discard this connection and retry with a new one
+            raise DisconnectionError()
+
+
+class QueryStats:
+    """Statements executed while handling one request."""
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# Set by the metrics middleware for the duration of a request
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def install_query_metrics(sync_engine, name: str, slow_query_ms: float):
+    """Time every statement, count it against the current request and log slow ones."""
+    slow_seconds = slow_query_ms / 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _record_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+        query_duration_seconds.observe(elapsed, engine=name)
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+        if slow_seconds and elapsed >= slow_seconds:
+            slow_queries_total.inc(engine=name)
+            logger.warning(f"Slow query ({elapsed * 1000:.0f} ms): {' '.join(statement.split())[:500]}")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _discard_timer(exception_context):
+        # after_cursor_execute doesn't run for failed statements
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started_at"):
+            conn.info["query_started_at"].pop()
+
+
+def _install_hooks(primary, read):
+    for name, engine_ in (("primary", primary), ("read", read)):
+        if name == "read" and engine_ is primary:
+            continue
+        sync_engine = getattr(engine_, "sync_engine", engine_)
+        install_liveness_check(sync_engine, settings.database_ping_idle_seconds)
+        install_query_metrics(sync_engine, name, settings.database_slow_query_ms)
+
+
+_install_hooks(engine, read_engine)
+if async_engine is not None:
+    _install_hooks(async_engine, async_read_engine)
+for _name, _replica in replica_engines.items():
+    install_liveness_check(getattr(_replica, "sync_engine", _replica), settings.database_ping_idle_seconds)
+    install_query_metrics(getattr(_replica, "sync_engine", _replica), _name, settings.database_slow_query_ms)
+
+# Shared breaker: fast-fail with 503 while the database is down
+db_breaker = CircuitBreaker(
+    "database",
+    failure_threshold=settings.database_breaker_failure_threshold,
+    probe_interval=settings.database_breaker_probe_interval,
+)
+
+
+def _unavailable() -> HTTPException:
+    # Database connection failed - return 503 Service Unavailable
+    return HTTPException(
+        status_code=503,  # HTTP_503_SERVICE_UNAVAILABLE
+        detail="Database service is currently unavailable. Please try again later."
+    )
+
+
+def _pool_exhausted(error: PoolTimeoutError) -> HTTPException:
+    # Every pooled connection stayed busy for DATABASE_POOL_TIMEOUT: this worker is
+    # overloaded, the database isn't down, so the breaker is left alone
+    logger.warning(f"Database pool exhausted: {error}")
+    return HTTPException(status_code=503, detail="The server is busy. Please try again.",
+                         headers={"Retry-After": "1"})
+
+
+def is_connection_failure(error: OperationalError) -> bool:
+    """The connection was lost or could not be opened, as opposed to one statement failing."""
+    # Errors while connecting carry no statement; lost connections are invalidated
+    return error.connection_invalidated or error.statement is None
+
+
+def _is_statement_timeout(error: OperationalError) -> bool:
+    # query_canceled, raised by statement_timeout (psycopg2 pgcode, asyncpg sqlstate)
+    return "57014" in (getattr(error.orig, "pgcode", None), getattr(error.orig, "sqlstate", None))
+
+
+@event.listens_for(Session, "after_begin")
+def _mark_connected(session, transaction, connection):
+    # Sessions only check out a connection on first use; requests served entirely
+    # from caches never do, and say nothing about whether the database is up
+    session.info["connected"] = True
+
+
+def _operational_error(replica: Optional[str], error: OperationalError) -> HTTPException:
+    """The response for ``error``; only connection failures count toward the breaker."""
+    where = f" on {replica}" if replica else ""
+    if not is_connection_failure(error):
+        # Statement timeouts and lock waits (SQLite "database is locked") mean the database
+        # is busy, not down: fail this request without taking the whole API offline
+        logger.warning(f"Database statement failed{where}: {error}")
+        if _is_statement_timeout(error):
+            return HTTPException(status_code=504, detail="The database took too long to answer. Please try again.")
+        return HTTPException(status_code=503, detail="The database is busy. Please try again.",
+                             headers={"Retry-After": "1"})
+
+    logger.error(f"Database error{where}: {error}")
+    if replica is None:
+        db_breaker.record_failure()
+    else:
+        # Only this replica is taken out of rotation until the next lag check
+        replicas.mark_down(replica)
+    return _unavailable()
+
+
+@contextmanager
+def _session_scope(session_factory, replica: Optional[str] = None):
+    if replica is None and db_breaker.is_open:
+        raise _unavailable()
+    db = session_factory()
+    db.info["replica"] = replica
     try:
-        # Test the connection by executing a simple query
-        # This will raise OperationalError if the database is unavailable
-        db.execute(text("SELECT 1"))
         yield db
+        if replica is None and db.info.get("connected"):
+            db_breaker.record_success()
     except OperationalError as e:
-        # Database connection failed - return 503 Service Unavailable
-        db.close()
-        raise HTTPException(
-            status_code=503,  # HTTP_503_SERVICE_UNAVAILABLE
-            detail="Database service is currently unavailable. Please try again later."
-        )
-    except Exception as e:
-        # Other database errors
-        db.close()
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Database error: {e}")
-        raise HTTPException(
-            status_code=503,  # HTTP_503_SERVICE_UNAVAILABLE
-            detail="Database service error. Please try again later."
-        )
+        raise _operational_error(replica, e)
+    except PoolTimeoutError as e:
+        raise _pool_exhausted(e)
     finally:
         db.close()
 
+
+@asynccontextmanager
+async def _async_session_scope(session_factory, replica: Optional[str] = None):
+    if replica is None and db_breaker.is_open:
+        raise _unavailable()
+    async with session_factory() as db:
+        db.info["replica"] = replica
+        try:
+            yield db
+            if replica is None and db.info.get("connected"):
+                db_breaker.record_success()
+        except OperationalError as e:
+            raise _operational_error(replica, e)
+        except PoolTimeoutError as e:
+            raise _pool_exhausted(e)
+
+
+def _read_target(last_write: Optional[str] = None):
+    """(session factory, replica name or None) for a read-only session."""
+    primary = AsyncReadSessionLocal if async_engine is not None else ReadSessionLocal
+    if not replicas:
+        return primary, None
+    if wrote_recently(last_write):
+        read_routing_total.inc(target="sticky")
+        return primary, None
+    replica = replicas.choose()
+    if replica is None:
+        return primary, None
+    return replica_sessions[replica], replica
+
+
+def _get_sync_db():
+    """Get database session with error handling for connection failures."""
+    with _session_scope(SessionLocal) as db:
+        yield db
+
+
+def _get_sync_read_db(last_write: Optional[str] = Cookie(None, alias=WRITE_COOKIE)):
+    """Session for read-only handlers: a healthy replica if any, else the read pool."""
+    with _session_scope(*_read_target(last_write)) as db:
+        yield db
+
+
+async def _get_async_db():
+    """Get an AsyncSession with error handling for connection failures."""
+    async with _async_session_scope(AsyncSessionLocal) as db:
+        yield db
+
+
+async def _get_async_read_db(last_write: Optional[str] = Cookie(None, alias=WRITE_COOKIE)):
+    """AsyncSession for read-only handlers: a healthy replica if any, else the read pool."""
+    async with _async_session_scope(*_read_target(last_write)) as db:
+        yield db
+
+
+# Dependencies to get database sessions (AsyncSession in async mode, Session otherwise).
+# get_read_db is for handlers that only read: replicas when configured, the read pool on SQLite.
+get_db = _get_async_db if settings.database_async_mode else _get_sync_db
+get_read_db = _get_async_read_db if settings.database_async_mode else _get_sync_read_db
+
+
+async def run_db(db, fn, *args, **kwargs):
+    """Run ``fn(session, *args, **kwargs)`` without blocking the event loop.
+
+    Query code is written once against a plain ``Session``. With an AsyncSession
+    it runs through ``run_sync`` on the asyncpg connection, otherwise it runs in
+    the threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+async def run_in_session(fn, *args, **kwargs):
+    """Run ``fn(session, *args, **kwargs)`` on a fresh session, for work outside a request."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(fn, *args, **kwargs)
+
+    def _run():
+        with SessionLocal() as db:
+            return fn(db, *args, **kwargs)
+    return await run_in_threadpool(_run)
+
+
+async def run_on_primary(fn, *args, **kwargs):
+    """Run ``fn(session, *args, **kwargs)`` on a fresh read-only session that never uses a replica."""
+    try:
+        if AsyncReadSessionLocal is not None:
+            async with AsyncReadSessionLocal() as db:
+                return await db.run_sync(fn, *args, **kwargs)
+
+        def _run():
+            with ReadSessionLocal() as db:
+                return fn(db, *args, **kwargs)
+        return await run_in_threadpool(_run)
+    except PoolTimeoutError as e:
+        # Called from request handlers (login), which share the pool with get_db
+        raise _pool_exhausted(e)
+
+
+async def run_in_read_session(fn, *args, **kwargs):
+    """Run ``fn(session, *args, **kwargs)`` on a fresh read-only session: a healthy replica
+    if any, else the read pool. For background reads that can tolerate replica lag."""
+    session_factory, _ = _read_target()
+    if async_engine is not None:
+        async with session_factory() as db:
+            return await db.run_sync(fn, *args, **kwargs)
+
+    def _run():
+        with session_factory() as db:
+            return fn(db, *args, **kwargs)
+    return await run_in_threadpool(_run)
+
+
+def stream_results(statement, transform, batch_size: int = 1000, header: str = ""):
+    """Yield ``transform(rows)`` for each batch of rows read via a server-side cursor.
+
+    Opens its own session, because the request's ``get_db`` session is closed
+    before a StreamingResponse body is sent. Returns an async generator in
+    async mode and a plain generator otherwise; StreamingResponse accepts both
+    (plain generators are iterated in the threadpool).
+    """
+    session_factory, replica = _read_target()
+    if replica is None and db_breaker.is_open:
+        raise _unavailable()
+    statement = statement.execution_options(yield_per=batch_size)
+
+    async def _stream_async():
+        if header:
+            yield header
+        async with session_factory() as db:
+            result = await db.stream(statement)
+            async for rows in result.partitions():
+                yield transform(rows)
+
+    def _stream_sync():
+        if header:
+            yield header
+        with session_factory() as db:
+            result = db.execute(statement)
+            for rows in result.partitions():
+                yield transform(rows)
+
+    return _stream_async() if async_engine is not None else _stream_sync()
+
+
+def _ping_sync():
+    with read_engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+async def ping_database():
+    """Run ``SELECT 1`` on a pooled connection. Raises if the database is unreachable."""
+    if async_engine is not None:
+        async with async_read_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    else:
+        await run_in_threadpool(_ping_sync)
+
+
+# Replay lag; 0 on a primary and while the replica has replayed everything it received
+# (the replay timestamp stops advancing when the primary is idle)
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+def _replica_lag_sync(replica_engine) -> float:
+    with replica_engine.connect() as conn:
+        return float(conn.execute(REPLICA_LAG_QUERY).scalar())
+
+
+async def _replica_lag(replica_engine) -> float:
+    if isinstance(replica_engine, AsyncEngine):
+        async with replica_engine.connect() as conn:
+            return float((await conn.execute(REPLICA_LAG_QUERY)).scalar())
+    return await run_in_threadpool(_replica_lag_sync, replica_engine)
+
+
+async def refresh_replica_lag():
+    """Measure every replica's lag; unreachable or slow replicas leave the rotation."""
+    for name, replica_engine in replica_engines.items():
+        try:
+            lag = await asyncio.wait_for(_replica_lag(replica_engine), settings.health_check_timeout_seconds)
+        except Exception as e:
+            logger.warning(f"Replica {name} lag check failed: {e}")
+            lag = None
+        replicas.record_lag(name, lag)
+
+
 # Create all tables
 def create_tables():
     """Create all database tables. Handles connection errors gracefully."""
@@ -72,7 +641,21 @@ def create_tables():
         Base.metadata.create_all(bind=engine)
     except Exception as e:
         # Log the error but don't crash the application
-        import logging
-        logger = logging.getLogger(__name__)
         logger.warning(f"Failed to create tables during startup: {e}")
-        logger.info("Tables will be created automatically on first database connection") 
\ No newline at end of file
+        logger.info("Tables will be created automatically on first database connection")
+
+
+async def dispose_engines():
+    """Close pooled connections on shutdown."""
+    if async_engine is not None:
+        await async_engine.dispose()
+        if async_read_engine is not async_engine:
+            await async_read_engine.dispose()
+    engine.dispose()
+    if read_engine is not engine:
+        read_engine.dispose()
+    for replica_engine in replica_engines.values():
+        if isinstance(replica_engine, AsyncEngine):
+            await replica_engine.dispose()
+        else:
+            replica_engine.dispose()
@@ -1,11 +1,100 @@
+import asyncio
+import logging
+import time
 from fastapi import FastAPI,  Depends
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from .routers import signup, auth, user, health
 
 # Import local modules
-from .database import create_tables
+from . import metrics
+from .config import settings
+from .database import (
+    QueryStats, create_tables, current_query_stats, db_breaker, dispose_engines, ping_database,
+    refresh_replica_lag, replicas, run_in_session,
+)
+from .matching import donor_index
+from .oauth2 import revoked_tokens
+from .profiling import install_profiling
+from .utils import CALIBRATION_TOLERANCE_ROUNDS, calibrate_bcrypt_rounds, hash_pool, set_bcrypt_rounds
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
 
+logger = logging.getLogger(__name__)
+
+http_requests_total = metrics.counter(
+    "http_requests_total", "Requests handled, by route template and status", ["method", "route", "status"])
+http_request_duration_seconds = metrics.histogram(
+    "http_request_duration_seconds", "Request latency, by route template", ["method", "route"])
+http_request_db_queries = metrics.histogram(
+    "http_request_db_queries", "SQL statements executed per request", ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and query count per route.
+
+    Routes are labelled by their template (``/users/{user_id}``), never the raw
+    path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_query_stats.reset(token)
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            http_requests_total.inc(method=method, route=route, status=status_code)
+            http_request_duration_seconds.observe(elapsed, method=method, route=route)
+            http_request_db_queries.observe(stats.count, method=method, route=route)
+
+
+async def _every(interval: float, job, run_now: bool = False):
+    """Run ``await job()`` every ``interval`` seconds until cancelled, logging failures.
+
+    The first run happens after one interval, or right away with ``run_now``.
+    """
+    if not run_now:
+        await asyncio.sleep(interval)
+    while True:
+        try:
+            await job()
+        except Exception as e:
+            logger.warning(f"Background job {job.__name__} failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def _purge_tokens():
+    revoked_tokens.prune()
+    deleted = await run_in_session(auth.purge_refresh_tokens)
+    if deleted:
+        logger.info(f"Purged {deleted} expired refresh tokens")
+    deleted = await run_in_session(auth.purge_revoked_access_tokens)
+    if deleted:
+        logger.info(f"Purged {deleted} expired access token revocations")
+
+
 # Use FastAPI lifespan event for table creation
 
 
@@ -15,14 +104,40 @@ async def lifespan(app):
     try:
         create_tables()
     except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
         logger.warning(f"Could not create tables on startup: {e}")
         logger.info("Application will continue - tables will be created on first use")
+    if settings.bcrypt_target_ms > 0:
+        # Each worker calibrates on its own; the tolerance stops them rehashing each other's hashes
+        rounds = await run_in_threadpool(calibrate_bcrypt_rounds, settings.bcrypt_target_ms)
+        set_bcrypt_rounds(rounds, tolerance=CALIBRATION_TOLERANCE_ROUNDS)
+    background_tasks = [
+        # Probe the database in the background while the circuit breaker is open
+        asyncio.create_task(db_breaker.monitor(ping_database)),
+        asyncio.create_task(_every(settings.refresh_token_purge_interval_seconds, _purge_tokens)),
+        # Logouts handled by other workers
+        asyncio.create_task(_every(
+            settings.revoked_tokens_sync_seconds, auth.sync_revoked_tokens, run_now=True)),
+        # Readiness probes are answered from the status this keeps fresh
+        asyncio.create_task(_every(
+            settings.health_check_interval_seconds, health.refresh_readiness, run_now=True)),
+    ]
+    if donor_index.enabled:
+        # Loads the matching index, then keeps it in step with other workers' writes
+        background_tasks.append(asyncio.create_task(_every(
+            settings.donor_index_refresh_seconds, donor_index.refresh, run_now=True)))
+    if replicas:
+        # Replicas take reads only once a lag check has found them caught up
+        background_tasks.append(asyncio.create_task(_every(
+            settings.health_check_interval_seconds, refresh_replica_lag, run_now=True)))
     yield
+    for task in background_tasks:
+        task.cancel()
+    hash_pool.shutdown()
+    await dispose_engines()
 
 app = FastAPI(title='Blood Donation API',
-              description='API for blood donation signup', lifespan=lifespan)
+              description='API for blood donation signup', lifespan=lifespan,
+              default_response_class=ORJSONResponse)
 
 origins = [
     "http://localhost:3000",  # Next.js dev server
@@ -38,6 +153,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+install_profiling(app)
+app.add_middleware(MetricsMiddleware)
 
 # Root endpoint - welcome message
 
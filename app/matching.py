@@ -0,0 +1,253 @@
+"""Donor matching for urgent requests: who can give red cells to a patient in a city today.
+
+``DonorIndex`` keeps every donor in memory, bucketed by (lower(city), blood
+group) and sorted by the date they may next donate, so a match is a few
+bisects over the compatible groups instead of a database query. Signup, bulk
+import and profile updates keep it current in this worker; ``refresh`` (run in
+the background) loads it at startup and then fetches rows whose updated_at
+moved, which picks up writes made by other workers.
+
+Until the first load finishes, and when DONOR_INDEX_ENABLED is off, matches are
+answered by the database with the same ranking.
+"""
+import bisect
+import logging
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Mapping, Optional, Tuple
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.orm import Session
+from . import metrics, models
+from .blood import COMPATIBLE_DONORS, DONATION_INTERVAL_DAYS
+from .config import settings
+from .database import run_db, run_in_read_session
+
+logger = logging.getLogger(__name__)
+
+donor_index_donors = metrics.gauge("donor_index_donors", "Donors held by the in-memory matching index")
+donor_index_corrections_total = metrics.counter(
+    "donor_index_corrections_total",
+    "Donors the consistency check had to add, update or remove (writes from other workers, or drift)",
+    ["kind"])
+donor_matches_total = metrics.counter("donor_matches_total", "Donor match queries, by what answered them", ["source"])
+donor_match_seconds = metrics.histogram(
+    "donor_match_seconds", "Time to rank donors for one match query", ["source"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+
+DONOR_COLUMNS = (models.User.id, models.User.version, models.User.updated_at) + models.USER_RESPONSE_COLUMNS
+# Rows per IN (...) when reloading changed donors
+LOAD_BATCH_SIZE = 500
+# Re-read this far behind the newest updated_at seen: rows stamped by other workers'
+# clocks, or committed after a later-stamped row, still get picked up
+CHANGE_OVERLAP = timedelta(minutes=5)
+# Sorts before every real donation date: never donated means eligible the longest
+NEVER_DONATED = date.min
+
+
+def next_eligible_date(last_donation_date: Optional[date]) -> date:
+    if last_donation_date is None:
+        return NEVER_DONATED
+    return last_donation_date + timedelta(days=DONATION_INTERVAL_DAYS)
+
+
+def _bucket_key(city: str, blood_group: str) -> Tuple[str, str]:
+    return city.lower(), blood_group
+
+
+class DonorIndex:
+    """Donors by (lower(city), blood group), each bucket sorted by (next eligible date, id).
+
+    Matches rank compatible groups in COMPATIBLE_DONORS order (identical group
+    first), then donors who have been eligible the longest.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.loaded = False
+        # id -> (bucket key, bucket entry, version, UserResponse fields)
+        self._donors: Dict[str, tuple] = {}
+        self._buckets: Dict[Tuple[str, str], List[Tuple[date, str]]] = {}
+        # Latest updated_at seen, and when every id/version was last compared
+        self._watermark = None
+        self._last_full_check = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._donors)
+
+    def upsert(self, row: Mapping):
+        """Add or move a donor; ``row`` has id, version and the UserResponse fields."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._upsert(row)
+        donor_index_donors.set(len(self._donors))
+
+    def remove(self, user_id: str):
+        with self._lock:
+            self._remove(user_id)
+        donor_index_donors.set(len(self._donors))
+
+    def _upsert(self, row: Mapping):
+        current = self._donors.get(row["id"])
+        if current is not None and current[2] > row["version"]:
+            return  # a newer version is already indexed
+        self._remove(row["id"])
+        key = _bucket_key(row["city"], row["blood_group"])
+        entry = (next_eligible_date(row["last_donation_date"]), row["id"])
+        bisect.insort(self._buckets.setdefault(key, []), entry)
+        donor = {field: row[field] for field in models.USER_RESPONSE_FIELDS}
+        self._donors[row["id"]] = (key, entry, row["version"], donor)
+
+    def _remove(self, user_id: str):
+        donor = self._donors.pop(user_id, None)
+        if donor is None:
+            return
+        key, entry = donor[0], donor[1]
+        bucket = self._buckets[key]
+        del bucket[bisect.bisect_left(bucket, entry)]
+        if not bucket:
+            del self._buckets[key]
+
+    def match(self, blood_group: str, city: str, limit: int, today: Optional[date] = None) -> List[dict]:
+        """Up to ``limit`` donors in ``city`` who can donate to ``blood_group`` on ``today``, best first."""
+        today = today or date.today()
+        city = city.strip().lower()
+        matches = []
+        with self._lock:
+            for group in COMPATIBLE_DONORS[blood_group]:
+                bucket = self._buckets.get((city, group))
+                if not bucket:
+                    continue
+                # Buckets are sorted by eligibility date, so the eligible donors are a prefix
+                eligible = bisect.bisect_right(bucket, today, key=lambda entry: entry[0])
+                for _, user_id in bucket[:min(eligible, limit - len(matches))]:
+                    matches.append(self._donors[user_id][3])
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def versions(self) -> Dict[str, int]:
+        with self._lock:
+            return {user_id: donor[2] for user_id, donor in self._donors.items()}
+
+    async def refresh(self):
+        """Load the index, then keep it in step with the database.
+
+        Each run fetches the donors whose updated_at moved since the last one; a
+        full id/version comparison (which also notices deleted donors) runs at
+        startup and every DONOR_INDEX_FULL_CHECK_SECONDS. Both read from a
+        replica or the read pool, never the writer.
+        """
+        if not self.enabled:
+            return
+        if not self.loaded or time.monotonic() - self._last_full_check >= settings.donor_index_full_check_seconds:
+            await self._full_check()
+        elif self._watermark is not None:
+            rows = await run_in_read_session(_changed_donors, self._watermark - CHANGE_OVERLAP)
+            self._apply(rows)
+        else:
+            # No row has an updated_at yet: only the full check can see changes
+            return
+
+    async def _full_check(self):
+        known = self.versions()
+        stored = await run_in_read_session(_stored_versions)
+        changed = [user_id for user_id, version in stored.items() if known.get(user_id) != version]
+        rows = []
+        if changed:
+            # Reloading most of the table is cheaper as one scan than as many IN (...) batches
+            rows = await run_in_read_session(_load_donors, None if len(changed) > len(stored) // 2 else changed)
+        removed = {user_id: version for user_id, version in known.items() if user_id not in stored}
+        self._apply(rows, removed)
+        self._last_full_check = time.monotonic()
+
+    def _apply(self, rows: List[Mapping], removed: Optional[Dict[str, int]] = None):
+        added = updated = deleted = 0
+        with self._lock:
+            for row in rows:
+                if row["updated_at"] is not None and (self._watermark is None or row["updated_at"] > self._watermark):
+                    self._watermark = row["updated_at"]
+                current = self._donors.get(row["id"])
+                if current is not None and current[2] >= row["version"]:
+                    continue
+                if current is None:
+                    added += 1
+                else:
+                    updated += 1
+                self._upsert(row)
+            for user_id, version in (removed or {}).items():
+                # Skip donors written again since the version snapshot was taken
+                if user_id in self._donors and self._donors[user_id][2] == version:
+                    self._remove(user_id)
+                    deleted += 1
+        donor_index_donors.set(len(self._donors))
+
+        if not self.loaded:
+            self.loaded = True
+            logger.info(f"Donor index loaded with {len(self._donors)} donors")
+            return
+        for kind, count in (("added", added), ("updated", updated), ("removed", deleted)):
+            if count:
+                donor_index_corrections_total.inc(count, kind=kind)
+        if added or updated or deleted:
+            logger.info(f"Donor index reconciled: {added} added, {updated} updated, {deleted} removed")
+
+
+def _stored_versions(db: Session) -> Dict[str, int]:
+    return dict(db.execute(select(models.User.id, models.User.version)).all())
+
+
+def _changed_donors(db: Session, since) -> List[Mapping]:
+    # Uses ix_users_updated_at
+    return list(db.execute(select(*DONOR_COLUMNS).where(models.User.updated_at > since)).mappings())
+
+
+def _load_donors(db: Session, user_ids: Optional[List[str]] = None) -> List[Mapping]:
+    """Every donor, or only ``user_ids``."""
+    if user_ids is None:
+        return list(db.execute(select(*DONOR_COLUMNS)).mappings())
+    rows = []
+    for start in range(0, len(user_ids), LOAD_BATCH_SIZE):
+        batch = user_ids[start:start + LOAD_BATCH_SIZE]
+        rows.extend(db.execute(select(*DONOR_COLUMNS).where(models.User.id.in_(batch))).mappings())
+    return rows
+
+
+def query_matches(db: Session, blood_group: str, city: str, limit: int, today: Optional[date] = None):
+    """The database's answer to DonorIndex.match, in the same order."""
+    today = today or date.today()
+    groups = COMPATIBLE_DONORS[blood_group]
+    cutoff = today - timedelta(days=DONATION_INTERVAL_DAYS)
+    query = (
+        select(*models.USER_RESPONSE_COLUMNS)
+        # Uses ix_users_blood_group_city_last_donation
+        .where(
+            models.User.blood_group.in_(groups),
+            func.lower(models.User.city) == city.strip().lower(),
+            or_(models.User.last_donation_date.is_(None), models.User.last_donation_date <= cutoff),
+        )
+        .order_by(
+            case({group: rank for rank, group in enumerate(groups)}, value=models.User.blood_group),
+            models.User.last_donation_date.asc().nulls_first(),
+            models.User.id,
+        )
+        .limit(limit)
+    )
+    return [dict(row) for row in db.execute(query).mappings()]
+
+
+donor_index = DonorIndex(enabled=settings.donor_index_enabled)
+
+
+async def find_donors(db, blood_group: str, city: str, limit: int) -> Tuple[List[dict], str]:
+    """(ranked donors, "index" or "database")."""
+    started = time.perf_counter()
+    if donor_index.loaded:
+        donors, source = donor_index.match(blood_group, city, limit), "index"
+    else:
+        donors, source = await run_db(db, query_matches, blood_group, city, limit), "database"
+    donor_matches_total.inc(source=source)
+    donor_match_seconds.observe(time.perf_counter() - started, source=source)
+    return donors, source
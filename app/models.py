@@ -1,6 +1,13 @@
-from sqlalchemy import Column, String, Date, TIMESTAMP
+from sqlalchemy import Column, String, Date, TIMESTAMP, Index, Boolean, ForeignKey, Integer
 from sqlalchemy.sql import func
+from datetime import datetime, timezone
 from .database import Base
+from .schemas import UserResponse
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -15,7 +22,57 @@ class User(Base):
     city = Column(String(100), nullable=False)
     country = Column(String(100), nullable=False)
     password = Column(String(255), nullable=False)  # In production, this should be hashed
-    registration_date = Column(TIMESTAMP(timezone=True), default=func.now(), nullable=False)
+    # Set in Python with microseconds: SQLite's CURRENT_TIMESTAMP has whole seconds only, which
+    # breaks the (registration_date, id) keyset order against microsecond cursors
+    registration_date = Column(TIMESTAMP(timezone=True), default=_utcnow, nullable=False)
+    # Bumped by every profile update; the ETag of /users/me/profile
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Last insert/update, so the donor matching index can fetch only what changed.
+    # NULL for rows untouched since the column was added (the periodic full check covers them)
+    updated_at = Column(TIMESTAMP(timezone=True), default=_utcnow, onupdate=_utcnow, nullable=True, index=True)
+
+    __table_args__ = (
+        # Keyset pagination for GET /users/ (newest first)
+        Index("ix_users_registration_date_id", "registration_date", "id"),
+        # Donor matching fallback: blood group and city equality, then donation date order
+        Index("ix_users_blood_group_city_last_donation", "blood_group", func.lower(city), "last_donation_date"),
+        # Donor search, one query per blood group, read in keyset order (with and without a city)
+        Index("ix_users_blood_group_city_registration",
+              "blood_group", func.lower(city), "registration_date", "id"),
+        Index("ix_users_blood_group_registration", "blood_group", "registration_date", "id"),
+    )
+
+    def __repr__(self):
+        return f"<User(id={self.id}, name={self.name}, phone={self.phone_number})>"
+
+
+# The columns a UserResponse is built from, in field order
+USER_RESPONSE_FIELDS = tuple(UserResponse.model_fields)
+USER_RESPONSE_COLUMNS = tuple(getattr(User, field) for field in USER_RESPONSE_FIELDS)
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(String(36), primary_key=True, index=True)
+    user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token = Column(String(500), unique=True, nullable=False, index=True)  # SHA-256 of the token, never the token itself
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(TIMESTAMP(timezone=True), default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<RefreshToken(id={self.id}, user_id={self.user_id}, active={self.is_active})>"
+
+
+class RevokedAccessToken(Base):
+    """Access tokens revoked before they expired; every worker syncs these into memory."""
+    __tablename__ = "revoked_access_tokens"
+
+    jti = Column(String(32), primary_key=True)
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
+    # Set in Python with microseconds, so workers can fetch only what is new
+    revoked_at = Column(TIMESTAMP(timezone=True), default=_utcnow, nullable=False, index=True)
 
     def __repr__(self):
-        return f"<User(id={self.id}, name={self.name}, phone={self.phone_number})>"
\ No newline at end of file
+        return f"<RevokedAccessToken(jti={self.jti}, expires_at={self.expires_at})>"
@@ -1,44 +1,133 @@
-from jose import JWTError, jwt
-from datetime import datetime, timedelta
-from fastapi import HTTPException, status, Depends
-from fastapi.security import OAuth2PasswordBearer
-from .config import settings
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
-
-SECRET_KEY = settings.secret_key
-ALGORITHM = settings.algorithm
-ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
-
-def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-def verify_token(token: str, credentials_exception):
-    # Import here to avoid circular imports
-    from app import schemas
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("user_id")
-        
-        if user_id is None:
-            raise credentials_exception
-            
-        token_data = schemas.TokenData(id=user_id)
-    except JWTError:
-        raise credentials_exception
-    return token_data
-
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    """Get current user token data only"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-
-    return verify_token(token, credentials_exception)
\ No newline at end of file
+from jose import JWTError, jwt
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException, status, Depends
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
+import hashlib
+import hmac
+import threading
+import time
+import uuid
+from typing import Optional, Tuple
+from . import schemas
+from .cache import InMemoryTTLCache
+from .config import settings
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+
+# Partner credentials (blood banks, hospitals, drive organisers) for bulk endpoints
+partner_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+PARTNER_API_KEYS = [key.strip() for key in settings.partner_api_keys.split(",") if key.strip()]
+
+SECRET_KEY = settings.secret_key
+ALGORITHM = settings.algorithm
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
+
+# Verified token payloads keyed by SHA-256 of the token; entries expire at the token's exp
+token_cache = InMemoryTTLCache("token", settings.token_cache_size, ttl=0)
+
+
+class RevokedTokens:
+    """jti of access tokens revoked before they expired (e.g. on logout).
+
+    Kept in memory so the per-request check never touches the database. An
+    entry is only needed until the token's own exp, so the set stays small.
+    Each worker holds its own set; revocations are also stored in the database
+    and ``merge`` pulls in the ones made by other workers.
+    """
+
+    def __init__(self):
+        self._expiry = {}
+        # Newest revoked_at merged from the database
+        self.synced_until = None
+        self._lock = threading.Lock()
+
+    def revoke(self, jti: str, exp: float):
+        with self._lock:
+            self._expiry[jti] = exp
+
+    def merge(self, rows):
+        """Add stored (jti, exp, revoked_at) rows."""
+        with self._lock:
+            for jti, exp, revoked_at in rows:
+                self._expiry[jti] = exp
+                if self.synced_until is None or revoked_at > self.synced_until:
+                    self.synced_until = revoked_at
+
+    def __contains__(self, jti) -> bool:
+        return jti in self._expiry
+
+    def prune(self):
+        now = time.time()
+        with self._lock:
+            self._expiry = {jti: exp for jti, exp in self._expiry.items() if exp > now}
+
+
+revoked_tokens = RevokedTokens()
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def create_access_token(data: dict):
+    to_encode = data.copy()
+    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+def create_user_access_token(user_id: str, profile=None):
+    """Access token for a user, embedding the UserResponse fields when enabled."""
+    data = {"user_id": user_id}
+    if settings.jwt_embed_profile and profile is not None:
+        data["profile"] = schemas.UserResponse.model_validate(profile).model_dump(mode="json")
+    return create_access_token(data)
+
+def _decode(token: str) -> dict:
+    key = hash_token(token)
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.set(key, payload, ttl=payload.get("exp", 0) - time.time())
+    return payload
+
+def verify_token(token: str, credentials_exception):
+    try:
+        payload = _decode(token)
+        user_id = payload.get("user_id")
+
+        if user_id is None or payload.get("jti") in revoked_tokens:
+            raise credentials_exception
+
+        token_data = schemas.TokenData(id=user_id, profile=payload.get("profile"))
+    except JWTError:
+        raise credentials_exception
+    return token_data
+
+def revoke_access_token(token: str) -> Optional[Tuple[str, float]]:
+    """Reject this (already verified) access token in this worker from now until it expires.
+
+    Returns its (jti, exp) for the caller to store, so other workers reject it too.
+    """
+    payload = _decode(token)
+    if not payload.get("jti"):
+        return None
+    revoked_tokens.revoke(payload["jti"], payload.get("exp", 0))
+    return payload["jti"], payload.get("exp", 0)
+
+def get_current_user(token: str = Depends(oauth2_scheme)):
+    """Get current user token data only"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    return verify_token(token, credentials_exception)
+
+def require_partner_key(api_key: Optional[str] = Depends(partner_key_header)) -> str:
+    """Require a configured partner API key. Returns an id for the key (not the key itself)."""
+    if api_key and any(hmac.compare_digest(api_key.encode(), key.encode()) for key in PARTNER_API_KEYS):
+        return hash_token(api_key)[:16]
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="A partner API key is required"
+    )
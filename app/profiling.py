@@ -0,0 +1,139 @@
+"""Opt-in per-request profiling.
+
+A request is profiled when it carries ``X-Profile: <PROFILING_HEADER_TOKEN>``
+or is picked by ``PROFILING_SAMPLE_RATE``. The profile is written to
+``PROFILING_DIR`` as ``<timestamp>_<method>_<route>_<ms>ms.prof`` (pstats,
+open with ``python -m pstats`` or snakeviz) or ``.html`` with pyinstrument.
+
+Only the event loop thread is profiled: time spent in the threadpool (bcrypt,
+sync-mode queries) shows up as waiting, so compare with the /metrics
+histograms. One request is profiled at a time per process, and other requests
+served concurrently on the loop appear in the same profile.
+"""
+import cProfile
+import hmac
+import logging
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from starlette.concurrency import run_in_threadpool
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pyinstrument import Profiler as _Pyinstrument
+except ImportError:  # optional dependency
+    _Pyinstrument = None
+
+PROFILE_HEADER = b"x-profile"
+_UNSAFE_FILENAME_CHARACTERS = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class _CProfile:
+    extension = "prof"
+
+    def __init__(self):
+        self._profiler = cProfile.Profile()
+
+    def start(self):
+        self._profiler.enable()
+
+    def stop(self):
+        self._profiler.disable()
+
+    def write(self, path: str):
+        self._profiler.dump_stats(path)
+
+
+class _PyinstrumentProfile:
+    extension = "html"
+
+    def __init__(self):
+        self._profiler = _Pyinstrument(async_mode="enabled")
+
+    def start(self):
+        self._profiler.start()
+
+    def stop(self):
+        self._profiler.stop()
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            f.write(self._profiler.output_html())
+
+
+def _profiler_class(name: str):
+    if name == "pyinstrument":
+        if _Pyinstrument is not None:
+            return _PyinstrumentProfile
+        logger.warning("PROFILING_FORMAT=pyinstrument but pyinstrument is not installed; using cProfile")
+    return _CProfile
+
+
+def profile_filename(method: str, route: str, elapsed: float, extension: str) -> str:
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+    route = _UNSAFE_FILENAME_CHARACTERS.sub("_", route.strip("/")) or "root"
+    return f"{timestamp}_{method}_{route}_{elapsed * 1000:.0f}ms.{extension}"
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles selected requests."""
+
+    def __init__(self, app, sample_rate: float = 0.0, header_token: str = "",
+                 directory: str = "profiles", profiler: str = "cprofile"):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.header_token = header_token.encode()
+        self.directory = directory
+        self.profiler_class = _profiler_class(profiler)
+        # cProfile can't nest, and interleaved requests would blur each other anyway
+        self._busy = False
+
+    def _wants_profile(self, scope) -> bool:
+        if self.header_token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return hmac.compare_digest(value, self.header_token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._busy or not self._wants_profile(scope):
+            return await self.app(scope, receive, send)
+
+        self._busy = True
+        profiler = self.profiler_class()
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            self._busy = False
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            filename = profile_filename(scope["method"], route, elapsed, profiler.extension)
+            try:
+                await run_in_threadpool(self._write, profiler, filename)
+            except OSError as e:
+                logger.warning(f"Could not write profile {filename}: {e}")
+
+    def _write(self, profiler, filename: str):
+        os.makedirs(self.directory, exist_ok=True)
+        profiler.write(os.path.join(self.directory, filename))
+        logger.info(f"Wrote request profile {filename}")
+
+
+def install_profiling(app):
+    """Add ProfilingMiddleware to ``app`` when a sample rate or header token is configured."""
+    if settings.profiling_sample_rate > 0 or settings.profiling_header_token:
+        app.add_middleware(
+            ProfilingMiddleware,
+            sample_rate=settings.profiling_sample_rate,
+            header_token=settings.profiling_header_token,
+            directory=settings.profiling_dir,
+            profiler=settings.profiling_format,
+        )
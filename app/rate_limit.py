@@ -0,0 +1,143 @@
+"""Token-bucket rate limiting for the unauthenticated, bcrypt-heavy endpoints.
+
+``RateLimitStore`` is the interface limiters talk to. ``InMemoryRateLimitStore``
+is the default; it is per process, so with several workers each one enforces
+the limit separately. A shared store (e.g.
+Redis with a Lua script) can be plugged in by implementing ``take``.
+
+The limits run as the first dependencies of /login, /signup/, /signup/bulk and
+/users/export, before any database query or password hash.
+"""
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+from . import metrics, oauth2
+from .config import settings
+from .validators import normalize_email, normalize_phone_number
+
+rate_limit_rejected_total = metrics.counter(
+    "rate_limit_rejected_total", "Requests rejected by a rate limiter", ["limiter"])
+
+
+class RateLimitStore(ABC):
+    """Token buckets keyed by string."""
+
+    @abstractmethod
+    def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        """Take one token from bucket ``key`` (created full).
+
+        Returns 0 when a token was available, otherwise the seconds until one is.
+        """
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """Buckets local to this process, least recently used evicted beyond ``maxsize``.
+
+    An evicted bucket simply starts over full.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill_per_second):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / refill_per_second
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+rate_limit_store: RateLimitStore = InMemoryRateLimitStore(settings.rate_limit_store_size)
+
+
+def set_rate_limit_store(store: RateLimitStore):
+    """Swap the bucket store, e.g. for one shared by all workers."""
+    global rate_limit_store
+    rate_limit_store = store
+
+
+class RateLimiter:
+    """Allows bursts of ``per_minute`` requests per key, refilled evenly over a minute."""
+
+    def __init__(self, name: str, per_minute: float):
+        self.name = name
+        self.capacity = per_minute
+        self.refill_per_second = per_minute / 60
+
+    def check(self, key: str):
+        """Raise 429 with Retry-After when ``key`` is over its limit. A limit of 0 disables it."""
+        if self.capacity <= 0:
+            return
+        wait = rate_limit_store.take(f"{self.name}:{key}", self.capacity, self.refill_per_second)
+        if wait:
+            rate_limit_rejected_total.inc(limiter=self.name)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please try again later.",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+
+login_ip_limiter = RateLimiter("login_ip", settings.login_rate_limit_per_ip)
+login_identifier_limiter = RateLimiter("login_identifier", settings.login_rate_limit_per_identifier)
+signup_ip_limiter = RateLimiter("signup_ip", settings.signup_rate_limit_per_ip)
+bulk_import_limiter = RateLimiter("bulk_import", settings.bulk_import_rate_limit_per_key)
+export_limiter = RateLimiter("export", settings.export_rate_limit_per_key)
+
+
+def client_ip(request: Request) -> str:
+    if settings.rate_limit_trust_forwarded_for:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            # The last entry is the one added by our own proxy; earlier ones are client-supplied
+            return forwarded.rsplit(",", 1)[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _login_identifier(username: str) -> str:
+    # Same normalization as the login lookup, so "0300-1234567" and "03001234567" share a bucket
+    return normalize_email(username) if "@" in username else normalize_phone_number(username)
+
+
+async def limit_login(request: Request, login_data: OAuth2PasswordRequestForm = Depends()):
+    """Per-IP and per-account login throttle."""
+    login_ip_limiter.check(client_ip(request))
+    login_identifier_limiter.check(_login_identifier(login_data.username))
+
+
+async def limit_signup(request: Request):
+    """Per-IP signup throttle."""
+    signup_ip_limiter.check(client_ip(request))
+
+
+async def limit_bulk_import(partner: str = Depends(oauth2.require_partner_key)):
+    """Per-partner-key bulk import throttle (after the key check)."""
+    bulk_import_limiter.check(partner)
+
+
+async def limit_export(partner: str = Depends(oauth2.require_partner_key)):
+    """Per-partner-key registry export throttle (after the key check)."""
+    export_limiter.check(partner)
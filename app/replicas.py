@@ -0,0 +1,60 @@
+"""Read-replica selection: round-robin over replicas that are up and caught up.
+
+``ReplicaSet`` only tracks state; app/database.py owns the engines, measures
+lag in the background and routes read-only sessions through ``choose()``.
+"""
+import itertools
+import threading
+from typing import Dict, Iterable, Optional
+from . import metrics
+
+replica_lag_seconds = metrics.gauge(
+    "db_replica_lag_seconds", "Replication lag at the last check (-1 when unreachable)", ["replica"])
+read_routing_total = metrics.counter(
+    "db_read_routing_total", "Read-only sessions, by where they were sent", ["target"])
+
+
+class ReplicaSet:
+    """Replicas with their last measured lag.
+
+    A replica is used only while its lag is known and at most
+    ``max_lag_seconds``; until the first check, or after it fails, reads fall
+    back to the primary.
+    """
+
+    def __init__(self, names: Iterable[str], max_lag_seconds: float):
+        self.names = list(names)
+        self.max_lag_seconds = max_lag_seconds
+        self._lag: Dict[str, Optional[float]] = {name: None for name in self.names}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self.names)
+
+    def record_lag(self, name: str, lag: Optional[float]):
+        """Store a lag measurement; ``None`` marks the replica unreachable."""
+        self._lag[name] = lag
+        replica_lag_seconds.set(-1 if lag is None else lag, replica=name)
+
+    def mark_down(self, name: str):
+        self.record_lag(name, None)
+
+    def is_healthy(self, name: str) -> bool:
+        lag = self._lag[name]
+        return lag is not None and lag <= self.max_lag_seconds
+
+    def choose(self) -> Optional[str]:
+        """Next healthy replica in round-robin order, or None to use the primary."""
+        healthy = [name for name in self.names if self.is_healthy(name)]
+        if not healthy:
+            read_routing_total.inc(target="primary")
+            return None
+        with self._lock:
+            index = next(self._counter)
+        name = healthy[index % len(healthy)]
+        read_routing_total.inc(target=name)
+        return name
+
+    def status(self) -> dict:
+        return {name: {"lag_seconds": self._lag[name], "healthy": self.is_healthy(name)} for name in self.names}
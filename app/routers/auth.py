@@ -1,29 +1,184 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import logging
+import secrets
+import uuid
+from sqlalchemy import delete, select, update
 from sqlalchemy.orm import Session
-from app import schemas, models, utils, oauth2
-from app.database import get_db
+from app import schemas, models, utils, oauth2, rate_limit
+from app.config import settings
+from app.database import get_db, mark_recent_write, run_db, run_in_read_session, run_in_session, run_on_primary
+from app.validators import is_valid_phone_length, normalize_email, normalize_phone_number
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     tags=["auth"]
 )
 
-@router.post("/login", response_model=schemas.AccessTokenResponse)
+# Profile columns are only needed when they get embedded in the token
+LOGIN_COLUMNS = (models.User.id, models.User.password)
+if settings.jwt_embed_profile:
+    LOGIN_COLUMNS += models.USER_RESPONSE_COLUMNS
+
+def _find_login(db: Session, username: str):
+    """Look up (id, password) by email or phone, normalized the way signup stores them."""
+    if "@" in username:
+        column, value = models.User.email, normalize_email(username)
+    else:
+        column, value = models.User.phone_number, normalize_phone_number(username)
+        if not is_valid_phone_length(value):
+            # Signup never stores such a number, so skip the query
+            return None
+    return db.execute(select(*LOGIN_COLUMNS).where(column == value)).first()
+
+
+def _replace_password_hash(db: Session, user_id: str, old_hash: str, new_hash: str) -> bool:
+    # Only if the password wasn't changed in the meantime
+    result = db.execute(
+        update(models.User)
+        .where(models.User.id == user_id, models.User.password == old_hash)
+        .values(password=new_hash)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+async def _store_rehashed_password(user_id: str, old_hash: str, new_hash: str):
+    try:
+        if await run_in_session(_replace_password_hash, user_id, old_hash, new_hash):
+            utils.password_rehashed_total.inc()
+    except Exception as e:
+        # The old hash still works; the next login tries again
+        logger.warning(f"Could not store rehashed password for {user_id}: {e}")
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _issue_refresh_token(db: Session, user_id: str) -> str:
+    token = secrets.token_urlsafe(48)
+    now = datetime.now(timezone.utc)
+    db.add(models.RefreshToken(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        token=oauth2.hash_token(token),
+        expires_at=now + timedelta(days=settings.refresh_token_expire_days),
+        is_active=True,
+        created_at=now,
+    ))
+    db.commit()
+    return token
+
+
+def _rotate_refresh_token(db: Session, token: str):
+    """Deactivate ``token`` and issue a replacement. Returns (user_id, new token)."""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token"
+    )
+    stored = db.execute(
+        select(models.RefreshToken)
+        .where(models.RefreshToken.token == oauth2.hash_token(token))
+        .with_for_update()
+    ).scalar_one_or_none()
+    if stored is None or _as_utc(stored.expires_at) <= datetime.now(timezone.utc):
+        raise credentials_exception
+    if not stored.is_active:
+        # A rotated token was presented again: assume it leaked and end every session of the user
+        _revoke_refresh_tokens(db, stored.user_id)
+        raise credentials_exception
+
+    stored.is_active = False
+    return stored.user_id, _issue_refresh_token(db, stored.user_id)
+
+
+def _revoke_refresh_tokens(db: Session, user_id: str, token: Optional[str] = None):
+    query = update(models.RefreshToken).where(
+        models.RefreshToken.user_id == user_id,
+        models.RefreshToken.is_active.is_(True),
+    )
+    if token is not None:
+        query = query.where(models.RefreshToken.token == oauth2.hash_token(token))
+    db.execute(query.values(is_active=False))
+    db.commit()
+
+
+def _get_profile(db: Session, user_id: str):
+    return db.execute(select(*models.USER_RESPONSE_COLUMNS).where(models.User.id == user_id)).first()
+
+
+def purge_refresh_tokens(db: Session, batch_size: int = 1000) -> int:
+    """Delete expired refresh tokens in batches. Returns the number deleted.
+
+    Rotated and revoked tokens are kept until they expire: presenting a rotated
+    token again is how _rotate_refresh_token detects a stolen one.
+    """
+    deleted = 0
+    while True:
+        batch = select(models.RefreshToken.id).where(
+            models.RefreshToken.expires_at <= datetime.now(timezone.utc),
+        ).limit(batch_size)
+        result = db.execute(delete(models.RefreshToken).where(models.RefreshToken.id.in_(batch)))
+        db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+# Re-read this far behind the newest revoked_at merged: rows stamped by other workers'
+# clocks, or committed after a later-stamped row, still get picked up
+REVOKED_SYNC_OVERLAP = timedelta(minutes=5)
+
+
+def _store_revoked_access_token(db: Session, jti: str, exp: float):
+    db.add(models.RevokedAccessToken(jti=jti, expires_at=datetime.fromtimestamp(exp, timezone.utc)))
+    db.commit()
+
+
+def _revoked_access_tokens(db: Session, since: Optional[datetime]):
+    """Unexpired revocations, only those stored after ``since`` when given."""
+    table = models.RevokedAccessToken
+    query = select(table.jti, table.expires_at, table.revoked_at).where(
+        table.expires_at > datetime.now(timezone.utc))
+    if since is not None:
+        query = query.where(table.revoked_at > since)
+    return [(jti, _as_utc(expires_at).timestamp(), _as_utc(revoked_at))
+            for jti, expires_at, revoked_at in db.execute(query)]
+
+
+async def sync_revoked_tokens():
+    """Merge access tokens revoked by any worker into this worker's revoked set."""
+    since = oauth2.revoked_tokens.synced_until
+    if since is not None:
+        since -= REVOKED_SYNC_OVERLAP
+    oauth2.revoked_tokens.merge(await run_in_read_session(_revoked_access_tokens, since))
+
+
+def purge_revoked_access_tokens(db: Session) -> int:
+    """Delete revocations of tokens that have expired anyway. Returns the number deleted."""
+    result = db.execute(delete(models.RevokedAccessToken).where(
+        models.RevokedAccessToken.expires_at <= datetime.now(timezone.utc)))
+    db.commit()
+    return result.rowcount
+
+
+# Throttled before the lookup and the bcrypt verification
+@router.post("/login", response_model=schemas.AccessTokenResponse,
+             dependencies=[Depends(rate_limit.limit_login)])
 async def login(
+    background_tasks: BackgroundTasks,
+    response: Response,
     login_data: OAuth2PasswordRequestForm = Depends(), 
     db: Session = Depends(get_db)
 ):
-    # Find user by phone number or email
-    user = None
-    
-    # First try to find by phone number
-    user = db.query(models.User).filter(
-        models.User.phone_number == login_data.username).first()
-    
-    # If not found by phone, try to find by email
-    if not user:
-        user = db.query(models.User).filter(
-            models.User.email == login_data.username).first()
+    # Find user by phone number or email, on a session that is closed before the bcrypt
+    # check so no connection (the only writer connection, on SQLite) is held while hashing
+    user = await run_on_primary(_find_login, login_data.username)
 
     if not user:
         raise HTTPException(
@@ -31,27 +186,71 @@ async def login(
             detail="Invalid credentials"
         )
 
-    if not utils.verify_password(login_data.password, str(user.password)):
+    valid, new_hash = await utils.verify_and_update_password_async(login_data.password, str(user.password))
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, 
             detail="Invalid credentials"
         )
+    if new_hash:
+        # Stored with a different bcrypt cost: store the new hash after responding
+        background_tasks.add_task(_store_rehashed_password, user.id, user.password, new_hash)
+
+    # Right after signup the replicas may still lag behind (and the signup cookie may be
+    # missing, e.g. when someone else registered the donor); read from the primary for a while
+    mark_recent_write(response)
 
-    # Create access token
-    access_token = oauth2.create_access_token(data={"user_id": user.id})
+    # Create a short-lived access token plus a refresh token to renew it
+    access_token = oauth2.create_user_access_token(user.id, profile=user)
+    refresh_token = await run_db(db, _issue_refresh_token, user.id)
     
     return {
         "access_token": access_token,
-        "token_type": "bearer"
+        "token_type": "bearer",
+        "refresh_token": refresh_token
     }
 
 
+@router.post("/refresh", response_model=schemas.AccessTokenResponse)
+async def refresh(
+    data: schemas.RefreshRequest,
+    db: Session = Depends(get_db)
+):
+    """Exchange a refresh token for a new access token and a new refresh token"""
+    user_id, refresh_token = await run_db(db, _rotate_refresh_token, data.refresh_token)
+    profile = await run_db(db, _get_profile, user_id) if settings.jwt_embed_profile else None
+    return {
+        "access_token": oauth2.create_user_access_token(user_id, profile=profile),
+        "token_type": "bearer",
+        "refresh_token": refresh_token
+    }
+
+
+@router.post("/revoke")
+async def revoke(
+    data: Optional[schemas.RefreshRequest] = None,
+    db: Session = Depends(get_db),
+    current_user: schemas.TokenData = Depends(oauth2.get_current_user)
+):
+    """Revoke one refresh token, or every refresh token of the current user when none is given"""
+    await run_db(db, _revoke_refresh_tokens, current_user.id, data.refresh_token if data else None)
+    return {"message": "Refresh tokens revoked"}
+
 
 @router.post("/logout")
 async def logout(
+    data: Optional[schemas.RefreshRequest] = None,
+    token: str = Depends(oauth2.oauth2_scheme),
+    db: Session = Depends(get_db),
     current_user: schemas.TokenData = Depends(oauth2.get_current_user)
 ):
     """
-    Logout endpoint (client should discard the access token)
+    Logout endpoint: revokes the access token and, if given, the refresh token
     """
+    revoked = oauth2.revoke_access_token(token)
+    if revoked is not None:
+        # Other workers pick it up at their next sync
+        await run_db(db, _store_revoked_access_token, *revoked)
+    if data is not None:
+        await run_db(db, _revoke_refresh_tokens, current_user.id, data.refresh_token)
     return {"message": "Successfully logged out"}
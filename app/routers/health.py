@@ -1,28 +1,76 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from app.database import get_db
+import asyncio
+import time
+from datetime import datetime, timezone
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from app import metrics
+from app.config import settings
+from app.database import db_breaker, ping_database, pool_statuses, replicas
 
 router = APIRouter(
     tags=["health"]
 )
 
+# Last database check, refreshed in the background by refresh_readiness()
+_db_status = {"db": "unknown", "checked_at": None, "latency_ms": None, "error": None}
 
-@router.get("/health")
-async def health():
-    """Check the health of the server and database connection."""
+
+async def refresh_readiness():
+    """Ping the database once and record the outcome for /ready and /health."""
+    started = time.perf_counter()
     try:
-        db = next(get_db())
-        db.execute(text("SELECT 1"))
-        db.close()
+        await asyncio.wait_for(ping_database(), settings.health_check_timeout_seconds)
+    except Exception as e:
+        _db_status.update(db="disconnected", latency_ms=None, error=str(e) or type(e).__name__)
+    else:
+        latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        _db_status.update(db="connected", latency_ms=latency_ms, error=None)
+    _db_status["checked_at"] = datetime.now(timezone.utc).isoformat()
+
+
+def _is_ready() -> bool:
+    return _db_status["db"] == "connected" and not db_breaker.is_open
+
+
+@router.get("/live")
+async def live():
+    """Liveness: the process is up and serving requests. Never touches the database."""
+    return {"status": "ok"}
+
 
+@router.get("/ready")
+async def ready():
+    """Readiness: last background database check plus pool occupancy, served from memory."""
+    ready = _is_ready()
+    content = {
+        "status": "ok" if ready else "unavailable",
+        **_db_status,
+        "circuit_breaker": "open" if db_breaker.is_open else "closed",
+        "pools": pool_statuses(),
+        "replicas": replicas.status(),
+    }
+    return ORJSONResponse(content, status_code=200 if ready else 503)
+
+
+@router.get("/health")
+async def health():
+    """Check the health of the server and database connection (as of the last background check)."""
+    if _is_ready():
         return {
             "status": "ok",
             "db": "connected"
         }
+    if db_breaker.is_open:
+        message = "Database circuit breaker is open"
+    else:
+        message = _db_status["error"] or "Database has not been checked yet"
+    return {
+        "status": "error",
+        "message": message
+    }
 
-    except Exception as e:
-        return {
-            "status": "error",
-            "message": str(e)
-        }
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Process metrics in the Prometheus text format (per worker process)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
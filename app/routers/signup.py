@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Response, status
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app import schemas, models, utils
-from app.database import get_db
+from app import matching, schemas, models, utils, rate_limit
+from app.config import settings
+from app.database import get_db, mark_recent_write, run_db, run_on_primary
 import uuid
 
 router = APIRouter(
@@ -9,40 +14,158 @@ router = APIRouter(
     tags=["signup"]
 )
 
+# Rows per INSERT statement / IN (...) lookup during bulk import
+BULK_BATCH_SIZE = 500
+
+
+def _new_user_id() -> str:
+    # A full UUID: bulk inserts skip conflicting rows, so an id collision would
+    # silently drop a donor as "already registered"
+    return str(uuid.uuid4())
 
-@router.post("/", response_model=schemas.SignupResponse, status_code=status.HTTP_201_CREATED)
-async def signup(user_data: schemas.SignupRequest, db: Session = Depends(get_db)):
-    # Check if phone number already exists
-    print(user_data)
-    existing_user = db.query(models.User).filter(
-        models.User.phone_number == user_data.phone_number).first()
-    if existing_user:
-        raise HTTPException(
-            status_code=400, detail="Phone number already registered")
-    
-    # Check if email already exists (if provided)
-    if user_data.email:
-        existing_email_user = db.query(models.User).filter(
-            models.User.email == user_data.email).first()
-        if existing_email_user:
-            raise HTTPException(
-                status_code=400, detail="Email already registered")
-
-    # Generate unique user ID
-    user_id = f"USER_{uuid.uuid4().hex[:8].upper()}"
 
+def _insert_user(db: Session, values: dict):
+    # A single INSERT is atomic by itself; autocommit avoids separate BEGIN/COMMIT round trips
+    connection = db.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+    try:
+        connection.execute(insert(models.User.__table__).values(**values).returning(models.User.id))
+    except IntegrityError as e:
+        # The unique indexes on phone_number/email are the duplicate check
+        field = utils.unique_violation_field(e)
+        if field == "phone_number":
+            raise HTTPException(status_code=400, detail="Phone number already registered")
+        if field == "email":
+            raise HTTPException(status_code=400, detail="Email already registered")
+        raise
+
+
+@router.post("/", response_model=schemas.SignupResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(rate_limit.limit_signup)])
+async def signup(user_data: schemas.SignupRequest, response: Response, db: Session = Depends(get_db)):
     # Create user record
     user_dict = user_data.model_dump(exclude={"confirm_password"})
     raw_password = user_dict.pop("password")
-    hashed_password = utils.hash_password(raw_password)
-    db_user = models.User(**user_dict, id=user_id, password=hashed_password)
-
-    # Add to database
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    # Return response with message field (fix: avoid duplicate 'message')
-    data = schemas.SignupResponse.model_validate(db_user).model_dump()
-    data["message"] = "Registration successful! Thank you for signing up for blood donation."
-    return schemas.SignupResponse(**data)
\ No newline at end of file
+    hashed_password = await utils.hash_password_async(raw_password)
+    user_id = _new_user_id()
+    await run_db(db, _insert_user, dict(user_dict, id=user_id, password=hashed_password))
+    matching.donor_index.upsert(dict(user_dict, id=user_id, version=1))
+    # The new row may not be on the replicas yet when the user logs in and reads
+    mark_recent_write(response)
+
+    # Every response field comes from the request, so no refresh is needed
+    data = dict(user_dict, message="Registration successful! Thank you for signing up for blood donation.")
+    return schemas.SignupResponse(**data)
+
+
+def _validation_errors(e: ValidationError) -> list[str]:
+    return [f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()]
+
+
+def _find_registered(db: Session, phones: list[str], emails: list[str]):
+    """Phone numbers and emails that are already registered, in one query per batch."""
+    registered_phones, registered_emails = set(), set()
+    for start in range(0, max(len(phones), len(emails)), BULK_BATCH_SIZE):
+        phone_batch = phones[start:start + BULK_BATCH_SIZE]
+        email_batch = emails[start:start + BULK_BATCH_SIZE]
+        query = select(models.User.phone_number, models.User.email).where(or_(
+            models.User.phone_number.in_(phone_batch),
+            models.User.email.in_(email_batch),
+        ))
+        for phone, email in db.execute(query):
+            registered_phones.add(phone)
+            if email:
+                registered_emails.add(email)
+    return registered_phones, registered_emails
+
+
+def _insert_ignoring_conflicts(db: Session, rows: list[dict]) -> set[str]:
+    """Insert rows in batches, skipping rows that hit a unique index. Returns inserted ids."""
+    dialect = db.get_bind().dialect.name
+    table = models.User.__table__
+    if dialect == "postgresql":
+        statement = postgresql.insert(table).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        statement = sqlite.insert(table).on_conflict_do_nothing()
+    else:
+        statement = insert(table)
+    statement = statement.returning(table.c.id)
+
+    inserted = set()
+    for start in range(0, len(rows), BULK_BATCH_SIZE):
+        batch = rows[start:start + BULK_BATCH_SIZE]
+        inserted.update(db.execute(statement, batch).scalars())
+        db.commit()
+    return inserted
+
+
+# Bulk import donors from a blood-drive spreadsheet
+# Partners only: each row creates an account and costs a bcrypt hash
+@router.post("/bulk", response_model=schemas.BulkImportResponse,
+             dependencies=[Depends(rate_limit.limit_bulk_import)])
+async def bulk_signup(
+    rows: list[dict] = Body(..., description="Rows in the same shape as POST /signup/"),
+    db: Session = Depends(get_db)
+):
+    if len(rows) > settings.bulk_import_max_rows:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.bulk_import_max_rows} rows can be imported at once")
+
+    results = [schemas.BulkImportRowResult(row=i, status="error") for i in range(len(rows))]
+    valid = {}  # row index -> SignupRequest
+    seen_phones, seen_emails = set(), set()
+
+    # Validate every row, including duplicates within the upload itself
+    for i, raw in enumerate(rows):
+        try:
+            user_data = schemas.SignupRequest.model_validate(raw)
+        except ValidationError as e:
+            results[i].errors = _validation_errors(e)
+            continue
+        if user_data.phone_number in seen_phones:
+            results[i].errors = ["Duplicate phone number in upload"]
+            continue
+        if user_data.email and user_data.email in seen_emails:
+            results[i].errors = ["Duplicate email in upload"]
+            continue
+        seen_phones.add(user_data.phone_number)
+        if user_data.email:
+            seen_emails.add(user_data.email)
+        valid[i] = user_data
+
+    # One set-based lookup instead of two SELECTs per row, on a session that is closed
+    # before hashing so the writer connection is only taken for the inserts
+    registered_phones, registered_emails = await run_on_primary(
+        _find_registered, list(seen_phones), list(seen_emails))
+    for i, user_data in list(valid.items()):
+        if user_data.phone_number in registered_phones:
+            results[i].errors = ["Phone number already registered"]
+        elif user_data.email and user_data.email in registered_emails:
+            results[i].errors = ["Email already registered"]
+        else:
+            continue
+        del valid[i]
+
+    hashed = await utils.hash_passwords_async([user_data.password for user_data in valid.values()])
+
+    new_rows = []
+    for (i, user_data), hashed_password in zip(valid.items(), hashed):
+        row = user_data.model_dump(exclude={"confirm_password"})
+        row.update(id=_new_user_id(), password=hashed_password)
+        results[i].id = row["id"]
+        new_rows.append(row)
+
+    inserted = await run_db(db, _insert_ignoring_conflicts, new_rows) if new_rows else set()
+    for row in new_rows:
+        if row["id"] in inserted:
+            matching.donor_index.upsert(dict(row, version=1))
+    for i in valid:
+        if results[i].id in inserted:
+            results[i].status = "created"
+        else:
+            # Registered concurrently between the lookup and the insert
+            results[i].id = None
+            results[i].errors = ["Phone number or email already registered"]
+
+    created = len(inserted)
+    return schemas.BulkImportResponse(created=created, failed=len(rows) - created, results=results)
@@ -1,7 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import func, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app import schemas, models, utils
-from app.database import get_db
+from typing import Literal, Optional
+from datetime import date, datetime, timedelta
+import base64
+import binascii
+import csv
+import io
+import json
+import orjson
+from app import cache, matching, rate_limit, schemas, models, utils
+from app.blood import BLOOD_GROUPS, COMPATIBLE_DONORS, DONATION_INTERVAL_DAYS
+from app.config import settings
+from app.database import get_db, get_read_db, mark_recent_write, run_db, run_on_primary, stream_results
 from app import oauth2
 
 router = APIRouter(
@@ -9,67 +22,319 @@ router = APIRouter(
     tags=["users"]
 )
 
-def get_current_user_from_db(
-    db: Session = Depends(get_db),
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Only the columns UserResponse needs, plus the keyset columns for the cursor
+PAGE_COLUMNS = models.USER_RESPONSE_COLUMNS + (models.User.registration_date, models.User.id)
+# What a profile read or update returns: the page columns and the ETag version
+PROFILE_ROW_COLUMNS = PAGE_COLUMNS + (models.User.version,)
+EXPORT_COLUMNS = models.USER_RESPONSE_COLUMNS
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+EXPORT_BATCH_SIZE = 1000
+
+def _get_user(db: Session, user_id: str):
+    return db.execute(
+        select(*PROFILE_ROW_COLUMNS).where(models.User.id == user_id)
+    ).first()
+
+async def get_current_user_from_db(
+    db: Session = Depends(get_read_db),
     token_data: schemas.TokenData = Depends(oauth2.get_current_user)
-):
-    """Get current user object from database"""
-    user = db.query(models.User).filter(models.User.id == token_data.id).first()
+) -> schemas.CurrentUser:
+    """Get current user from the user cache, falling back to the database"""
+    cached = cache.user_cache.get(token_data.id)
+    if cached is not None:
+        return schemas.CurrentUser.model_validate(cached)
+
+    user = await run_db(db, _get_user, token_data.id)
+    if not user and db.info.get("replica"):
+        # A new account may not have reached the replica yet (or was written by another worker)
+        user = await run_on_primary(_get_user, token_data.id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
-    return user
+    current_user = schemas.CurrentUser.model_validate(user)
+    cache.user_cache.set(token_data.id, current_user.model_dump(mode="json"))
+    return current_user
 
-# Get all registered users  
-@router.get("/", response_model=list[schemas.UserResponse])
-async def get_users(
-    db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user_from_db)
-):
-    users = db.query(models.User).all()
-    return users
+def _encode_cursor(row) -> str:
+    raw = json.dumps([row.registration_date.isoformat(), row.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        registration_date, user_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(registration_date), str(user_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _page_query(limit: int, after, *filters):
+    """Newest donors first; ``after`` is the (registration_date, id) of the last row seen."""
+    query = select(*PAGE_COLUMNS).where(*filters).order_by(
+        models.User.registration_date.desc(), models.User.id.desc())
+    if after is not None:
+        query = query.where(
+            tuple_(models.User.registration_date, models.User.id) < tuple_(*after))
+    # Fetch one extra row to know whether there is a next page
+    return query.limit(limit + 1)
+
+def _to_page(rows, limit: int) -> ORJSONResponse:
+    """Serialize a UserPage straight from row tuples.
+
+    The columns are typed by the model, so validating every row through
+    UserResponse again only costs time; orjson encodes the dates itself.
+    """
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    # Rows end with the keyset columns, which zip() leaves out
+    items = [dict(zip(models.USER_RESPONSE_FIELDS, row)) for row in rows[:limit]]
+    return ORJSONResponse({"items": items, "next_cursor": next_cursor})
 
-    # Validate blood group
-    valid_groups = ["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"]
-    if blood_group.upper() not in valid_groups:
+def _list_users(db: Session, limit: int, after, *filters):
+    return db.execute(_page_query(limit, after, *filters)).all()
+
+def _search_users(db: Session, limit: int, after, blood_groups, *filters):
+    """_list_users for several blood groups: one query per group, merged newest first.
+
+    Each query reads ix_users_blood_group_city_registration (or, without a city,
+    ix_users_blood_group_registration) in keyset order and stops after a page;
+    a single blood_group IN (...) query would sort every matching donor first.
+    """
+    rows = []
+    for blood_group in blood_groups:
+        rows.extend(_list_users(db, limit, after, models.User.blood_group == blood_group, *filters))
+    rows.sort(key=lambda row: (row.registration_date, row.id), reverse=True)
+    return rows[:limit + 1]
+
+def _normalize_blood_group(blood_group: str) -> str:
+    # "A+" arrives as "A " when the + isn't URL-encoded
+    blood_group = blood_group.strip().replace(" ", "+").upper()
+    if blood_group in ("A", "B", "AB", "O"):
+        blood_group += "+"
+    if blood_group not in BLOOD_GROUPS:
         raise HTTPException(
             status_code=400, 
-            detail=f"Invalid blood group. Must be one of: {', '.join(valid_groups)}"
+            detail=f"Invalid blood group. Must be one of: {', '.join(BLOOD_GROUPS)}"
         )
-    
-    # Search users by blood group
-    users = db.query(models.User).filter(
-        models.User.blood_group == blood_group.upper()
-    ).all()
-    
-    if not users:
-        raise HTTPException(
-            status_code=404, 
-            detail=f"No users found with blood group {blood_group.upper()}"
+    return blood_group
+
+def _ndjson_rows(rows) -> bytes:
+    return b"".join(orjson.dumps(row._asdict(), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+def _csv_rows(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+def _csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_FIELDS)
+    return buffer.getvalue()
+
+def _search_filters(city: Optional[str], min_days_since_donation: Optional[int]):
+    filters = []
+    if city:
+        filters.append(func.lower(models.User.city) == city.strip().lower())
+    if min_days_since_donation is not None:
+        cutoff = date.today() - timedelta(days=min_days_since_donation)
+        filters.append(or_(
+            models.User.last_donation_date.is_(None),
+            models.User.last_donation_date <= cutoff,
+        ))
+    return filters
+
+def _etag(version: int) -> str:
+    return f'"{version}"'
+
+def _if_match_versions(if_match: Optional[str]):
+    """Versions an If-Match header accepts; None when any version will do."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions = []
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        # If-Match compares strongly, so weak tags never match
+        if tag.startswith('"') and tag.endswith('"') and tag[1:-1].isdigit():
+            versions.append(int(tag[1:-1]))
+    return versions
+
+def _precondition_failed(version: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Profile was modified; fetch it again and retry",
+        headers={"ETag": _etag(version)},
+    )
+
+def _update_profile(db: Session, user_id: str, values: dict, versions=None):
+    """Write ``values`` and bump the version in one UPDATE ... RETURNING.
+
+    Returns the updated profile row, or None when the user no longer exists.
+    """
+    statement = (
+        update(models.User.__table__)
+        .where(models.User.id == user_id)
+        .values(**values, version=models.User.version + 1)
+        .returning(*PROFILE_ROW_COLUMNS)
+    )
+    if versions is not None:
+        statement = statement.where(models.User.version.in_(versions))
+    # A single UPDATE is atomic by itself; autocommit avoids separate BEGIN/COMMIT round trips
+    connection = db.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+    try:
+        user = connection.execute(statement).first()
+    except IntegrityError as e:
+        field = utils.unique_violation_field(e)
+        if field == "phone_number":
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Phone number already registered")
+        if field == "email":
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
+        raise
+    if user is None and versions is not None:
+        # Only on failure: tell a stale version apart from a deleted user
+        version = connection.execute(
+            select(models.User.version).where(models.User.id == user_id)
+        ).scalar()
+        if version is not None:
+            raise _precondition_failed(version)
+    return user
+
+# Get registered users, one page at a time
+@router.get("/", response_model=schemas.UserPage)
+async def get_users(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_read_db), 
+    current_user: schemas.CurrentUser = Depends(get_current_user_from_db)
+):
+    after = _decode_cursor(cursor) if cursor else None
+    rows = await run_db(db, _list_users, limit, after)
+    return _to_page(rows, limit)
+
+
+# Search donors by blood group, city and time since last donation
+@router.get("/search", response_model=schemas.UserPage)
+async def search_donors(
+    blood_group: str,
+    city: Optional[str] = None,
+    compatible: bool = Query(False, description="Include every group that can donate to blood_group"),
+    min_days_since_donation: Optional[int] = Query(
+        None, ge=0, description=f"e.g. {DONATION_INTERVAL_DAYS} for donors eligible to give whole blood today"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_read_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user_from_db)
+):
+    blood_group = _normalize_blood_group(blood_group)
+    blood_groups = COMPATIBLE_DONORS[blood_group] if compatible else (blood_group,)
+    filters = _search_filters(city, min_days_since_donation)
+    after = _decode_cursor(cursor) if cursor else None
+    rows = await run_db(db, _search_users, limit, after, blood_groups, *filters)
+    return _to_page(rows, limit)
+
+
+# Rank the donors who can give blood to a patient today
+@router.get("/match", response_model=schemas.DonorMatches)
+async def match_donors(
+    blood_group: str = Query(..., description="The patient's blood group"),
+    city: str = Query(..., description="Where the donation is needed"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user_from_db)
+):
+    """Compatible donors in the city who are eligible today: identical blood group first,
+    then the other compatible groups, each ordered by how long the donor has been eligible"""
+    donors, source = await matching.find_donors(db, _normalize_blood_group(blood_group), city, limit)
+    return ORJSONResponse({"items": donors, "source": source})
+
+
+# Export the donor registry as NDJSON or CSV, streamed in constant memory
+# Partners only: it hands out every donor's contact details
+@router.get("/export", dependencies=[Depends(rate_limit.limit_export)])
+async def export_donors(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    blood_group: Optional[str] = None,
+    city: Optional[str] = None,
+):
+    query = select(*EXPORT_COLUMNS).order_by(models.User.registration_date, models.User.id)
+    if blood_group:
+        query = query.where(models.User.blood_group == _normalize_blood_group(blood_group))
+    if city:
+        query = query.where(func.lower(models.User.city) == city.strip().lower())
+
+    if format == "csv":
+        body = stream_results(query, _csv_rows, EXPORT_BATCH_SIZE, header=_csv_header())
+        return StreamingResponse(
+            body,
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="donors.csv"'},
         )
-    
-    return users
+    body = stream_results(query, _ndjson_rows, EXPORT_BATCH_SIZE)
+    return StreamingResponse(body, media_type="application/x-ndjson")
 
 
 # Get current user's profile
 @router.get("/me/profile", response_model=schemas.UserResponse)
 async def get_my_profile(
-    current_user: models.User = Depends(get_current_user_from_db)
+    response: Response,
+    db: Session = Depends(get_read_db),
+    token_data: schemas.TokenData = Depends(oauth2.get_current_user)
 ):
     """Get the current user's profile"""
-    return current_user
+    # Served straight from the token claims when the profile is embedded
+    if token_data.profile is not None:
+        return token_data.profile
+    user = await get_current_user_from_db(db, token_data)
+    if user.version is not None:
+        response.headers["ETag"] = _etag(user.version)
+    return user
+
+
+async def _save_profile(response: Response, db, user_id: str, values: dict, if_match: Optional[str]):
+    try:
+        user = await run_db(db, _update_profile, user_id, values, _if_match_versions(if_match))
+    finally:
+        # Even a failed precondition means the cached copy is out of date
+        cache.user_cache.delete(user_id)
+    # Replicas may not have this write yet; read from the primary for a while
+    mark_recent_write(response)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    matching.donor_index.upsert(user._mapping)
+    response.headers["ETag"] = _etag(user.version)
+    if settings.jwt_embed_profile:
+        # Tokens issued earlier still carry the old profile; hand out a fresh one
+        response.headers["X-Access-Token"] = oauth2.create_user_access_token(user.id, profile=user)
+    return user
 
 
 @router.put("/me/profile", response_model=schemas.UserResponse)
 async def update_my_profile(
     data: schemas.UpdateProfileRequest,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user_from_db)
+):
+    """Replace the current user's profile"""
+    return await _save_profile(response, db, current_user.id, data.model_dump(), if_match)
+
+
+@router.patch("/me/profile", response_model=schemas.UserResponse)
+async def patch_my_profile(
+    data: schemas.PatchProfileRequest,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user_from_db)
+    current_user: schemas.CurrentUser = Depends(get_current_user_from_db)
 ):
-    for field, value in data.model_dump().items():
-        setattr(current_user, field, value)
-    db.commit()
-    db.refresh(current_user)
-    return current_user
\ No newline at end of file
+    """Change only the fields sent. Send the profile's ETag in If-Match to avoid overwriting newer changes"""
+    values = data.model_dump(exclude_unset=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    return await _save_profile(response, db, current_user.id, values, if_match)
@@ -1,82 +1,21 @@
 from pydantic import BaseModel, field_validator
 from datetime import date
-from typing import Optional
-import re
+from typing import Literal, Optional
+from .validators import BloodGroup, Country, DonationDate, Email, Name, Password, PhoneNumber
 
 # Request schemas
 class SignupRequest(BaseModel):
-    name: str
-    last_name: str
-    email: Optional[str] = None
-    phone_number: str
-    blood_group: str
-    last_donation_date: Optional[date] = None
+    name: Name
+    last_name: Name
+    email: Optional[Email] = None
+    phone_number: PhoneNumber
+    blood_group: BloodGroup
+    last_donation_date: Optional[DonationDate] = None
     city: str
-    country: str
-    password: str
+    country: Country
+    password: Password
     confirm_password: str
 
-    @field_validator("name", "last_name")
-    @classmethod
-    def validate_names(cls, v):
-        if not v.strip():
-            raise ValueError("Name cannot be empty")
-        if not v.replace(" ", "").isalpha():
-            raise ValueError("Name should only contain letters and spaces")
-        return v.strip()
-
-    @field_validator("email")
-    @classmethod
-    def validate_email(cls, v):
-        if v is not None:
-            # Basic email validation regex
-            email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-            if not re.match(email_pattern, v.strip()):
-                raise ValueError("Invalid email format")
-            return v.strip().lower()
-        return v
-
-    @field_validator("phone_number")
-    @classmethod
-    def validate_phone(cls, v):
-        digits_only = re.sub(r"\D", "", v)
-        if len(digits_only) < 10 or len(digits_only) > 15:
-            raise ValueError("Phone number should be between 10-15 digits")
-        return digits_only
-
-    @field_validator("blood_group")
-    @classmethod
-    def validate_blood_group(cls, v):
-        valid_groups = ["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"]
-        if v.upper() not in valid_groups:
-            raise ValueError(f"Blood group must be one of: {', '.join(valid_groups)}")
-        return v.upper()
-
-    @field_validator("last_donation_date")
-    @classmethod
-    def validate_donation_date(cls, v):
-        if v and v > date.today():
-            raise ValueError("Last donation date cannot be in the future")
-        return v
-
-    @field_validator("country")
-    @classmethod
-    def validate_country(cls, v):
-        if v.strip().lower() != "pakistan":
-            raise ValueError("Currently, only registrations from Pakistan are accepted.")
-        return v.strip().title()
-
-    @field_validator("password")
-    @classmethod
-    def validate_password(cls, v):
-        if not (8 <= len(v) <= 20):
-            raise ValueError("Password must be between 8 and 20 characters long.")
-        if not any(c.isupper() for c in v):
-            raise ValueError("Password must contain at least one uppercase letter.")
-        if not any(c in '!@#$%^&*()-_=+[]{}|;:,.<>?/' for c in v):
-            raise ValueError("Password must contain at least one special character.")
-        return v
-
     @field_validator("confirm_password")
     @classmethod
     def validate_confirm_password(cls, v, info):
@@ -118,41 +57,72 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+class CurrentUser(UserResponse):
+    """The authenticated user, as cached by get_current_user_from_db."""
+    id: str
+    version: Optional[int] = None
+
+
+class UserPage(BaseModel):
+    items: list[UserResponse]
+    next_cursor: Optional[str] = None
+
+
+class DonorMatches(BaseModel):
+    """Donors who can give to the patient today, best match first."""
+    items: list[UserResponse]
+    # "index" (in-memory) or "database" (before the index has loaded)
+    source: Literal["index", "database"]
+
+
+class BulkImportRowResult(BaseModel):
+    row: int
+    status: Literal["created", "error"]
+    id: Optional[str] = None
+    errors: list[str] = []
+
+class BulkImportResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkImportRowResult]
+
+
 class AccessTokenResponse(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     id: Optional[str] = None
+    # UserResponse fields, present when the token embeds the profile
+    profile: Optional[UserResponse] = None
 
 class UpdateProfileRequest(BaseModel):
-    name: str
-    last_name: str
-    email: Optional[str] = None
-    phone_number: str
-    blood_group: str
+    name: Name
+    last_name: Name
+    email: Optional[Email] = None
+    phone_number: PhoneNumber
+    blood_group: BloodGroup
     city: str
-    last_donation_date: Optional[date] = None
-
-    @field_validator("phone_number")
+    last_donation_date: Optional[DonationDate] = None
+
+class PatchProfileRequest(BaseModel):
+    """UpdateProfileRequest with every field optional; only the fields sent are changed."""
+    name: Optional[Name] = None
+    last_name: Optional[Name] = None
+    email: Optional[Email] = None
+    phone_number: Optional[PhoneNumber] = None
+    blood_group: Optional[BloodGroup] = None
+    city: Optional[str] = None
+    last_donation_date: Optional[DonationDate] = None
+
+    @field_validator("name", "last_name", "phone_number", "blood_group", "city")
     @classmethod
-    def validate_phone(cls, v):
-        digits_only = re.sub(r"\D", "", v)
-        if len(digits_only) < 10 or len(digits_only) > 15:
-            raise ValueError("Phone number should be between 10-15 digits")
-        return digits_only
-
-    @field_validator("blood_group")
-    @classmethod
-    def validate_blood_group(cls, v):
-        valid_groups = ["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"]
-        if v.upper() not in valid_groups:
-            raise ValueError(f"Blood group must be one of: {', '.join(valid_groups)}")
-        return v.upper()
-
-    @field_validator("last_donation_date")
-    @classmethod
-    def validate_donation_date(cls, v):
-        if v and v > date.today():
-            raise ValueError("Last donation date cannot be in the future")
-        return v
\ No newline at end of file
+    def validate_not_null(cls, v):
+        # Only runs for fields that were sent; these columns can't be cleared
+        if v is None:
+            raise ValueError("Field cannot be null")
+        return v
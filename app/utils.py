@@ -1,10 +1,181 @@
+import asyncio
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
-from datetime import datetime, timedelta
+from . import metrics
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bounds for startup calibration (each extra round doubles the hashing time)
+CALIBRATION_MIN_ROUNDS = 10
+CALIBRATION_MAX_ROUNDS = 16
+# Workers calibrate separately and can land one round apart; hashes within this many
+# rounds of the calibrated cost are kept, so workers don't rehash each other's hashes
+CALIBRATION_TOLERANCE_ROUNDS = 1
+
+
+def _bcrypt_policy(rounds: int, tolerance: int = 0) -> dict:
+    # Hashes with a cost outside rounds +/- tolerance are flagged for rehashing
+    return {
+        "bcrypt__default_rounds": rounds,
+        "bcrypt__min_rounds": rounds - tolerance,
+        "bcrypt__max_rounds": rounds + tolerance,
+    }
+
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", **_bcrypt_policy(settings.bcrypt_rounds))
+
+password_hash_seconds = metrics.histogram(
+    "password_hash_seconds", "Time spent computing bcrypt hashes", ["operation"])
+password_hash_queue_wait_seconds = metrics.histogram(
+    "password_hash_queue_wait_seconds", "Time bcrypt jobs wait for a free worker", ["operation"])
+password_hash_rejected_total = metrics.counter(
+    "password_hash_rejected_total", "bcrypt jobs rejected because the pool was saturated", ["operation"])
+password_hash_pending = metrics.gauge(
+    "password_hash_pending", "bcrypt jobs queued or running")
+password_rehashed_total = metrics.counter(
+    "password_rehashed_total", "Stored hashes upgraded/downgraded to the current bcrypt cost on login")
+
+
+def unique_violation_field(error) -> Optional[str]:
+    """Which users column an IntegrityError's unique index violation is about, if any.
+
+    Uses the constraint name when the driver exposes it (psycopg2/asyncpg) and
+    falls back to the message (SQLite: "UNIQUE constraint failed: users.email").
+    """
+    orig = error.orig
+    constraint = getattr(getattr(orig, "diag", None), "constraint_name", None)
+    if constraint is None:
+        constraint = getattr(getattr(orig, "__cause__", None), "constraint_name", None)
+    text = constraint or str(orig)
+    for field in ("phone_number", "email"):
+        if field in text:
+            return field
+    return None
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def hash_password(password: str) :
     return pwd_context.hash(password)
 
 def verify_password(password: str, hashed_password: str) -> bool:
     return pwd_context.verify(password, hashed_password)
+
+def verify_and_update_password(password: str, hashed_password: str):
+    """(valid, new hash or None); a new hash is returned when the stored cost is not the current one."""
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+def set_bcrypt_rounds(rounds: int, tolerance: int = 0):
+    """Hash new passwords with ``rounds`` and flag hashes more than ``tolerance`` rounds away."""
+    pwd_context.update(**_bcrypt_policy(rounds, tolerance))
+    logger.info(f"bcrypt cost set to {rounds} rounds (stored hashes kept within +/-{tolerance})")
+
+
+def calibrate_bcrypt_rounds(target_ms: float) -> int:
+    """The bcrypt cost whose hash time on this machine is closest to, without exceeding, ``target_ms``."""
+    handler = pwd_context.handler("bcrypt").using(rounds=CALIBRATION_MIN_ROUNDS)
+    timings = []
+    for _ in range(3):
+        started = time.perf_counter()
+        handler.hash("calibration")
+        timings.append((time.perf_counter() - started) * 1000)
+    base_ms = min(timings)
+    rounds = CALIBRATION_MIN_ROUNDS + math.floor(math.log2(target_ms / base_ms))
+    rounds = max(CALIBRATION_MIN_ROUNDS, min(CALIBRATION_MAX_ROUNDS, rounds))
+    logger.info(
+        f"bcrypt calibration: {base_ms:.1f} ms at {CALIBRATION_MIN_ROUNDS} rounds, "
+        f"target {target_ms:.0f} ms -> {rounds} rounds (~{base_ms * 2 ** (rounds - CALIBRATION_MIN_ROUNDS):.0f} ms); "
+        f"set BCRYPT_ROUNDS={rounds} and unset BCRYPT_TARGET_MS to use this cost on every worker without calibrating")
+    return rounds
+
+
+class PasswordHashPool:
+    """Bounded thread pool that keeps bcrypt off the event loop.
+
+    bcrypt releases the GIL while hashing, so worker threads run in parallel.
+    Once ``workers + max_queue`` jobs are pending new jobs are rejected with a
+    503 instead of queueing without limit behind a login burst.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_pending = workers + max_queue
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    async def run(self, operation: str, func, *args):
+        self._admit(operation)
+        return await self._run(operation, func, *args)
+
+    def _admit(self, operation: str):
+        if self.pending >= self.max_pending:
+            password_hash_rejected_total.inc(operation=operation)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy. Please try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+
+    async def _run(self, operation: str, func, *args):
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            result = func(*args)
+            return result, started - submitted, time.perf_counter() - started
+
+        self.pending += 1
+        password_hash_pending.set(self.pending)
+        try:
+            loop = asyncio.get_running_loop()
+            result, waited, took = await loop.run_in_executor(self._executor, job)
+        finally:
+            self.pending -= 1
+            password_hash_pending.set(self.pending)
+
+        password_hash_queue_wait_seconds.observe(waited, operation=operation)
+        password_hash_seconds.observe(took, operation=operation)
+        return result
+
+    async def run_many(self, operation: str, func, items):
+        """Run ``func(item)`` for a batch, keeping at most half the workers busy.
+
+        Batch callers (bulk import) shouldn't fill the queue and starve logins.
+        The batch is admitted or rejected once, up front: rejecting it partway
+        would throw away the results already computed.
+        """
+        concurrency = max(1, self.workers // 2)
+        self._admit(operation)
+        results = []
+        for start in range(0, len(items), concurrency):
+            chunk = items[start:start + concurrency]
+            results.extend(await asyncio.gather(*(self._run(operation, func, item) for item in chunk)))
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+hash_pool = PasswordHashPool(settings.password_hash_workers, settings.password_hash_max_queue)
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the bounded hashing pool."""
+    return await hash_pool.run("hash", hash_password, password)
+
+async def hash_passwords_async(passwords: list[str]) -> list[str]:
+    """Hash many passwords in parallel on the hashing pool."""
+    return await hash_pool.run_many("hash", hash_password, passwords)
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    """Verify a password on the bounded hashing pool."""
+    return await hash_pool.run("verify", verify_password, password, hashed_password)
+
+async def verify_and_update_password_async(password: str, hashed_password: str):
+    """verify_and_update_password on the bounded hashing pool."""
+    return await hash_pool.run("verify", verify_and_update_password, password, hashed_password)
@@ -0,0 +1,99 @@
+"""Normalization and field validation shared by request schemas and identifier lookups.
+
+Patterns and lookup sets are built once at import. The annotated types below
+let pydantic-core do the type coercion natively and then run one plain
+function per field, with the same error messages the schemas always had.
+"""
+import re
+from datetime import date
+from typing import Annotated
+from pydantic import AfterValidator
+from .blood import BLOOD_GROUPS
+
+_NON_DIGITS = re.compile(r"\D")
+_EMAIL_PATTERN = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
+
+PHONE_MIN_DIGITS = 10
+PHONE_MAX_DIGITS = 15
+
+PASSWORD_MIN_LENGTH = 8
+PASSWORD_MAX_LENGTH = 20
+_PASSWORD_SPECIAL_CHARACTERS = frozenset("!@#$%^&*()-_=+[]{}|;:,.<>?/")
+
+_BLOOD_GROUP_SET = frozenset(BLOOD_GROUPS)
+_BLOOD_GROUP_ERROR = f"Blood group must be one of: {', '.join(BLOOD_GROUPS)}"
+
+
+def normalize_phone_number(value: str) -> str:
+    """Digits only, the form phone numbers are stored in."""
+    return _NON_DIGITS.sub("", value)
+
+
+def normalize_email(value: str) -> str:
+    return value.strip().lower()
+
+
+def is_valid_phone_length(digits: str) -> bool:
+    return PHONE_MIN_DIGITS <= len(digits) <= PHONE_MAX_DIGITS
+
+
+def validate_name(value: str) -> str:
+    value = value.strip()
+    if not value:
+        raise ValueError("Name cannot be empty")
+    if not value.replace(" ", "").isalpha():
+        raise ValueError("Name should only contain letters and spaces")
+    return value
+
+
+def validate_email(value: str) -> str:
+    value = value.strip()
+    if not _EMAIL_PATTERN.match(value):
+        raise ValueError("Invalid email format")
+    return value.lower()
+
+
+def validate_phone_number(value: str) -> str:
+    digits = normalize_phone_number(value)
+    if not is_valid_phone_length(digits):
+        raise ValueError("Phone number should be between 10-15 digits")
+    return digits
+
+
+def validate_blood_group(value: str) -> str:
+    value = value.upper()
+    if value not in _BLOOD_GROUP_SET:
+        raise ValueError(_BLOOD_GROUP_ERROR)
+    return value
+
+
+def validate_donation_date(value: date) -> date:
+    if value > date.today():
+        raise ValueError("Last donation date cannot be in the future")
+    return value
+
+
+def validate_country(value: str) -> str:
+    value = value.strip()
+    if value.lower() != "pakistan":
+        raise ValueError("Currently, only registrations from Pakistan are accepted.")
+    return value.title()
+
+
+def validate_password(value: str) -> str:
+    if not (PASSWORD_MIN_LENGTH <= len(value) <= PASSWORD_MAX_LENGTH):
+        raise ValueError("Password must be between 8 and 20 characters long.")
+    if not any(map(str.isupper, value)):
+        raise ValueError("Password must contain at least one uppercase letter.")
+    if _PASSWORD_SPECIAL_CHARACTERS.isdisjoint(value):
+        raise ValueError("Password must contain at least one special character.")
+    return value
+
+
+Name = Annotated[str, AfterValidator(validate_name)]
+Email = Annotated[str, AfterValidator(validate_email)]
+PhoneNumber = Annotated[str, AfterValidator(validate_phone_number)]
+BloodGroup = Annotated[str, AfterValidator(validate_blood_group)]
+DonationDate = Annotated[date, AfterValidator(validate_donation_date)]
+Country = Annotated[str, AfterValidator(validate_country)]
+Password = Annotated[str, AfterValidator(validate_password)]
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Concurrent-request throughput benchmark for the sync vs async database modes.
+
+Drives the app in-process through httpx's ASGI transport against the database
+configured in .env, so numbers include real database round trips: every request
+reads a page of GET /users/. The donor it signs up (random phone number and
+password) is deleted again afterwards.
+
+    python -m benchmarks.concurrency                 # current DATABASE_ASYNC_MODE
+    python -m benchmarks.concurrency --compare       # run both modes and compare
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+# A page of donors: one query per request. /users/me/profile is answered from the
+# user cache after the first request, so it wouldn't exercise the database mode
+BENCH_PATH = "/users/"
+BENCH_PARAMS = {"limit": 50}
+
+
+async def _bench(requests_total: int, concurrency: int) -> dict:
+    import httpx
+    from sqlalchemy import delete
+    from app import database, models
+    from app.main import app
+    from app.config import settings
+    from app.validators import normalize_phone_number
+
+    transport = httpx.ASGITransport(app=app)
+    # Register a throwaway donor and log in to get a token
+    phone = str(uuid.uuid4().int)[:12]
+    # Passwords are capped at 20 characters
+    password = f"Bench!{uuid.uuid4().hex[:14]}"
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            result = await _measure(client, phone, password, requests_total, concurrency)
+    finally:
+        # Refresh tokens go with the user (ON DELETE CASCADE)
+        with database.engine.begin() as conn:
+            conn.execute(delete(models.User).where(models.User.phone_number == normalize_phone_number(phone)))
+        await database.dispose_engines()
+    return dict(result, async_mode=settings.database_async_mode)
+
+
+async def _measure(client, phone: str, password: str, requests_total: int, concurrency: int) -> dict:
+    response = await client.post("/signup/", json={
+        "name": "Bench", "last_name": "User", "phone_number": phone,
+        "blood_group": "O+", "city": "Lahore", "country": "Pakistan",
+        "password": password, "confirm_password": password,
+    })
+    response.raise_for_status()
+    response = await client.post("/login", data={"username": phone, "password": password})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            r = await client.get(BENCH_PATH, params=BENCH_PARAMS, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            if r.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests_total)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests_total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(requests_total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+def _run_mode(async_mode: bool, args) -> dict:
+    env = dict(os.environ, DATABASE_ASYNC_MODE=str(async_mode).lower())
+    output = subprocess.check_output(
+        [sys.executable, "-m", "benchmarks.concurrency",
+         "-n", str(args.requests), "-c", str(args.concurrency)],
+        env=env,
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--requests", type=int, default=500)
+    parser.add_argument("-c", "--concurrency", type=int, default=50)
+    parser.add_argument("--compare", action="store_true", help="run sync and async modes and compare")
+    args = parser.parse_args()
+
+    if not args.compare:
+        print(json.dumps(asyncio.run(_bench(args.requests, args.concurrency))))
+        return
+
+    results = {"sync": _run_mode(False, args), "async": _run_mode(True, args)}
+    results["speedup"] = round(results["async"]["throughput_rps"] / results["sync"]["throughput_rps"], 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
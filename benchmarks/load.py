@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Reproducible load test for signup, login, user listing, donor search and profile reads.
+
+Starts app.main.app in-process (lifespan included) against a throwaway SQLite
+file (default) or the Postgres database configured in .env, seeds N synthetic
+donors (benchmarks/seed.py), then drives each workload concurrently through
+httpx's ASGI transport. Prints JSON with throughput, p50/p95/p99 latency and
+per-request database, bcrypt and pool-wait time taken from app.metrics.
+
+    python -m benchmarks.load --donors 10000 -n 500 -c 50 --output before.json
+    python -m benchmarks.load --donors 10000 -n 500 -c 50 --compare before.json
+    python -m benchmarks.load --donors 1000000 --workloads search -n 500 -c 1
+
+Rate limits are disabled for the run. Postgres runs delete the rows they
+created afterwards (seeded donors use 039..., signups 038... phone numbers).
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+WORKLOADS = ("signup", "login", "list", "search", "profile")
+# (blood_group, city, compatible, min_days_since_donation) cycled by the search workload
+SEARCHES = (
+    ("O-", "Lahore", False, 56),
+    ("AB+", "Karachi", True, 56),
+    ("A+", None, False, None),
+    ("B-", "Quetta", True, None),
+    ("AB+", None, True, 90),
+)
+
+
+def _configure(args) -> str:
+    """Environment for app.config; must run before anything imports the app."""
+    directory = None
+    if args.database == "sqlite":
+        directory = tempfile.mkdtemp(prefix="blood-bank-bench-")
+        os.environ["DATABASE_DRIVER_NAME"] = "sqlite"
+        os.environ["DATABASE_NAME"] = os.path.join(directory, "bench.db")
+        for name in ("DATABASE_HOSTNAME", "DATABASE_PORT", "DATABASE_USERNAME", "DATABASE_PASSWORD"):
+            os.environ.setdefault(name, "0" if name == "DATABASE_PORT" else "unused")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+    os.environ["DATABASE_ASYNC_MODE"] = str(args.async_mode).lower()
+    # Every request comes from one client; the limiter would be all we measure
+    for name in ("LOGIN_RATE_LIMIT_PER_IP", "LOGIN_RATE_LIMIT_PER_IDENTIFIER", "SIGNUP_RATE_LIMIT_PER_IP"):
+        os.environ[name] = "0"
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    return directory
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def _totals(histogram):
+    """(observations, sum) over every label combination (engines, operations)."""
+    samples = histogram.samples()
+    return sum(sum(data[:-1]) for _, data in samples), sum(data[-1] for _, data in samples)
+
+
+def _snapshot() -> dict:
+    from app import metrics
+    registry = metrics.collect()
+    db_queries, db_seconds = _totals(registry["db_query_duration_seconds"])
+    return {
+        "db_queries": db_queries,
+        "db_seconds": db_seconds,
+        "pool_wait_seconds": _totals(registry["db_pool_checkout_wait_seconds"])[1],
+        "hash_seconds": _totals(registry["password_hash_seconds"])[1],
+        "hash_queue_seconds": _totals(registry["password_hash_queue_wait_seconds"])[1],
+    }
+
+
+async def _run_workload(requests_total: int, concurrency: int, make_request) -> dict:
+    latencies = []
+    statuses = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await make_request(i)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    before = _snapshot()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests_total)))
+    elapsed = time.perf_counter() - started
+    after = _snapshot()
+
+    latencies.sort()
+    per_request = lambda key: round((after[key] - before[key]) / requests_total * 1000, 3)
+    return {
+        "requests": requests_total,
+        "errors": sum(count for code, count in statuses.items() if code >= 400),
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "throughput_rps": round(requests_total / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "db_queries_per_request": round((after["db_queries"] - before["db_queries"]) / requests_total, 2),
+        "db_ms_per_request": per_request("db_seconds"),
+        "pool_wait_ms_per_request": per_request("pool_wait_seconds"),
+        "hash_ms_per_request": per_request("hash_seconds"),
+        "hash_queue_ms_per_request": per_request("hash_queue_seconds"),
+    }
+
+
+async def _bench(args) -> dict:
+    import httpx
+    from sqlalchemy import delete
+    from app import database, models
+    from app.config import settings
+    from app.main import app
+    from app.utils import pwd_context
+    from benchmarks.seed import SEED_PASSWORD, phone_number, seed_database
+
+    results = {}
+    signup_phones = [f"038{i:08d}" for i in range(args.requests)]
+    async with app.router.lifespan_context(app):
+        seeded_ids = await asyncio.to_thread(seed_database, database.engine, args.donors, args.seed)
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                async def login(i):
+                    return await client.post("/login", data={
+                        "username": phone_number(i % args.donors), "password": SEED_PASSWORD})
+
+                # Untimed setup: tokens for the authenticated workloads and cursors to page through
+                tokens = []
+                for i in range(min(args.concurrency, args.donors, 20)):
+                    response = await login(i)
+                    response.raise_for_status()
+                    tokens.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+                cursors = [None]
+                while len(cursors) < 20:
+                    page = (await client.get("/users/", params={"limit": 50, "cursor": cursors[-1]},
+                                             headers=tokens[0])).json()
+                    if not page.get("next_cursor"):
+                        break
+                    cursors.append(page["next_cursor"])
+
+                async def signup(i):
+                    return await client.post("/signup/", json={
+                        "name": "Bench", "last_name": "Signup", "phone_number": signup_phones[i],
+                        "blood_group": "O+", "city": "Lahore", "country": "Pakistan",
+                        "password": SEED_PASSWORD, "confirm_password": SEED_PASSWORD,
+                    })
+
+                async def list_users(i):
+                    params = {"limit": 50}
+                    if cursors[i % len(cursors)]:
+                        params["cursor"] = cursors[i % len(cursors)]
+                    return await client.get("/users/", params=params, headers=tokens[i % len(tokens)])
+
+                async def search(i):
+                    blood_group, city, compatible, min_days = SEARCHES[i % len(SEARCHES)]
+                    params = {"blood_group": blood_group, "compatible": compatible, "limit": 50}
+                    if city:
+                        params["city"] = city
+                    if min_days is not None:
+                        params["min_days_since_donation"] = min_days
+                    return await client.get("/users/search", params=params, headers=tokens[i % len(tokens)])
+
+                async def profile(i):
+                    return await client.get("/users/me/profile", headers=tokens[i % len(tokens)])
+
+                workloads = {"signup": signup, "login": login, "list": list_users, "search": search, "profile": profile}
+                for name in args.workloads:
+                    results[name] = await _run_workload(args.requests, args.concurrency, workloads[name])
+        finally:
+            if args.database == "postgres":
+                with database.engine.begin() as conn:
+                    conn.execute(delete(models.User).where(models.User.id.in_(seeded_ids)))
+                    conn.execute(delete(models.User).where(models.User.phone_number.in_(signup_phones)))
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "database": args.database,
+            "async_mode": settings.database_async_mode,
+            "donors": args.donors,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "bcrypt_rounds": pwd_context.handler("bcrypt").default_rounds,
+        },
+        "workloads": results,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict) -> dict:
+    """current/baseline ratio per workload (>1 means higher than the baseline)."""
+    comparison = {}
+    for name, result in current["workloads"].items():
+        before = baseline.get("workloads", {}).get(name)
+        if not before:
+            continue
+        comparison[name] = {
+            key: round(result[key] / before[key], 3) if before[key] else None
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+        }
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", choices=("sqlite", "postgres"), default="sqlite",
+                        help="sqlite: throwaway local file; postgres: the database configured in .env")
+    parser.add_argument("--async-mode", action="store_true", help="run with DATABASE_ASYNC_MODE=true")
+    parser.add_argument("--donors", type=int, default=10000, help="synthetic donors to seed")
+    parser.add_argument("-n", "--requests", type=int, default=200, help="requests per workload")
+    parser.add_argument("-c", "--concurrency", type=int, default=20)
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bcrypt-rounds", type=int, help="override BCRYPT_ROUNDS for the run")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    args = parser.parse_args()
+
+    directory = _configure(args)
+    try:
+        report = asyncio.run(_bench(args))
+    finally:
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            report["comparison"] = compare(report, json.load(f))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
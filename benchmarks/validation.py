@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Per-request validation cost of signup payloads, before and after the shared
+validators in app/validators.py.
+
+"before" is the original SignupRequest (per-class field validators that
+recompile the email regex and rebuild the blood group list on every call),
+kept here verbatim as the reference; "after" is app.schemas.SignupRequest.
+
+    python -m benchmarks.validation -n 20000
+"""
+import argparse
+import json
+import re
+import time
+from datetime import date
+from typing import Optional
+
+from pydantic import BaseModel, ValidationError, field_validator
+
+PAYLOADS = {
+    "valid": {
+        "name": "John", "last_name": "Doe", "email": " John.Doe@Example.com",
+        "phone_number": "+92 300-1234567", "blood_group": "o-", "last_donation_date": "2024-01-15",
+        "city": "Lahore", "country": "pakistan",
+        "password": "Secret!Aa1", "confirm_password": "Secret!Aa1",
+    },
+    "invalid": {
+        "name": "J0hn", "last_name": "Doe", "email": "not-an-email",
+        "phone_number": "123", "blood_group": "C+",
+        "city": "Lahore", "country": "India",
+        "password": "secret", "confirm_password": "other",
+    },
+}
+
+
+class LegacySignupRequest(BaseModel):
+    name: str
+    last_name: str
+    email: Optional[str] = None
+    phone_number: str
+    blood_group: str
+    last_donation_date: Optional[date] = None
+    city: str
+    country: str
+    password: str
+    confirm_password: str
+
+    @field_validator("name", "last_name")
+    @classmethod
+    def validate_names(cls, v):
+        if not v.strip():
+            raise ValueError("Name cannot be empty")
+        if not v.replace(" ", "").isalpha():
+            raise ValueError("Name should only contain letters and spaces")
+        return v.strip()
+
+    @field_validator("email")
+    @classmethod
+    def validate_email(cls, v):
+        if v is not None:
+            email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+            if not re.match(email_pattern, v.strip()):
+                raise ValueError("Invalid email format")
+            return v.strip().lower()
+        return v
+
+    @field_validator("phone_number")
+    @classmethod
+    def validate_phone(cls, v):
+        digits_only = re.sub(r"\D", "", v)
+        if not (10 <= len(digits_only) <= 15):
+            raise ValueError("Phone number should be between 10-15 digits")
+        return digits_only
+
+    @field_validator("blood_group")
+    @classmethod
+    def validate_blood_group(cls, v):
+        valid_groups = ["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"]
+        if v.upper() not in valid_groups:
+            raise ValueError(f"Blood group must be one of: {', '.join(valid_groups)}")
+        return v.upper()
+
+    @field_validator("last_donation_date")
+    @classmethod
+    def validate_donation_date(cls, v):
+        if v and v > date.today():
+            raise ValueError("Last donation date cannot be in the future")
+        return v
+
+    @field_validator("country")
+    @classmethod
+    def validate_country(cls, v):
+        if v.strip().lower() != "pakistan":
+            raise ValueError("Currently, only registrations from Pakistan are accepted.")
+        return v.strip().title()
+
+    @field_validator("password")
+    @classmethod
+    def validate_password(cls, v):
+        if not (8 <= len(v) <= 20):
+            raise ValueError("Password must be between 8 and 20 characters long.")
+        if not any(c.isupper() for c in v):
+            raise ValueError("Password must contain at least one uppercase letter.")
+        if not any(c in '!@#$%^&*()-_=+[]{}|;:,.<>?/' for c in v):
+            raise ValueError("Password must contain at least one special character.")
+        return v
+
+    @field_validator("confirm_password")
+    @classmethod
+    def validate_confirm_password(cls, v, info):
+        if 'password' in info.data and v != info.data['password']:
+            raise ValueError("Passwords do not match")
+        return v
+
+
+def _outcome(model, payload):
+    try:
+        return model.model_validate(payload).model_dump()
+    except ValidationError as e:
+        return [(err["loc"], err["msg"]) for err in e.errors()]
+
+
+def _per_call_us(model, payload, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        try:
+            model.model_validate(payload)
+        except ValidationError:
+            pass
+    return round((time.perf_counter() - started) / iterations * 1e6, 2)
+
+
+def run(iterations: int) -> dict:
+    from app.schemas import SignupRequest
+
+    results = {}
+    for name, payload in PAYLOADS.items():
+        # Both models must accept/reject the same way with the same messages
+        assert _outcome(LegacySignupRequest, payload) == _outcome(SignupRequest, payload), name
+        before = _per_call_us(LegacySignupRequest, payload, iterations)
+        after = _per_call_us(SignupRequest, payload, iterations)
+        results[name] = {"before_us": before, "after_us": after, "speedup": round(before / after, 2)}
+    return {"iterations": iterations, **results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+# app.config reads its settings at import time. Point it at a throwaway SQLite file so
+# that importing the app can never reach the database configured in .env
+os.environ.update(
+    DATABASE_DRIVER_NAME="sqlite",
+    DATABASE_NAME=os.path.join(tempfile.mkdtemp(prefix="blood-bank-tests-"), "test.db"),
+    DATABASE_HOSTNAME="unused",
+    DATABASE_PORT="0",
+    DATABASE_USERNAME="unused",
+    DATABASE_PASSWORD="unused",
+    DATABASE_REPLICA_URLS="",
+    SECRET_KEY="test-secret",
+    ALGORITHM="HS256",
+    ACCESS_TOKEN_EXPIRE_MINUTES="30",
+)
+
+import pytest
+
+
+class Clock:
+    """Stand-in for time.monotonic that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("time.monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def db():
+    """A session on the throwaway SQLite database; users are deleted afterwards."""
+    from sqlalchemy import delete
+    from app import database, models
+
+    database.Base.metadata.create_all(database.engine)
+    session = database.SessionLocal()
+    yield session
+    session.close()
+    with database.engine.begin() as conn:
+        conn.execute(delete(models.User))
@@ -0,0 +1,70 @@
+import pytest
+from app import metrics
+from app.cache import CacheBackend, InMemoryTTLCache
+
+
+def _count(metric: str, cache: str) -> float:
+    return dict(metrics.collect()[metric].samples()).get((cache,), 0)
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend("abstract", ttl=1)
+
+
+def test_get_returns_what_was_set():
+    cache = InMemoryTTLCache("test_get", maxsize=10, ttl=60)
+    cache.set("a", {"id": "a"})
+    assert cache.get("a") == {"id": "a"}
+    assert cache.get("missing") is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = InMemoryTTLCache("test_expiry", maxsize=10, ttl=60)
+    cache.set("default", 1)
+    cache.set("short", 2, ttl=5)
+    clock.advance(5)
+    assert cache.get("short") is None
+    assert cache.get("default") == 1
+    clock.advance(55)
+    assert cache.get("default") is None
+    assert len(cache) == 0
+
+
+def test_non_positive_ttl_stores_nothing():
+    cache = InMemoryTTLCache("test_no_ttl", maxsize=10, ttl=0)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=-3)
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = InMemoryTTLCache("test_lru", maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_delete_and_clear():
+    cache = InMemoryTTLCache("test_delete", maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.delete("a")
+    cache.delete("never-set")
+    assert cache.get("a") is None
+    cache.clear()
+    assert cache.get("b") is None
+
+
+def test_hits_and_misses_are_counted():
+    cache = InMemoryTTLCache("test_counts", maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    assert _count("cache_hits_total", "test_counts") == 2
+    assert _count("cache_misses_total", "test_counts") == 1
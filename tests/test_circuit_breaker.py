@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app import database
+from app.circuit_breaker import CircuitBreaker
+
+
+class _DriverError(Exception):
+    pgcode = None
+
+
+def _error(statement="SELECT 1", connection_invalidated=False, pgcode=None) -> OperationalError:
+    orig = _DriverError("boom")
+    orig.pgcode = pgcode
+    return OperationalError(statement, {}, orig, connection_invalidated=connection_invalidated)
+
+
+@pytest.fixture
+def breaker():
+    database.db_breaker.record_success()
+    yield database.db_breaker
+    database.db_breaker.record_success()
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test_open", failure_threshold=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.is_open
+    breaker.record_failure()
+    assert breaker.is_open
+
+
+def test_success_resets_the_count():
+    breaker = CircuitBreaker("test_reset", failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert not breaker.is_open
+
+
+def test_monitor_closes_once_a_probe_succeeds():
+    breaker = CircuitBreaker("test_monitor", failure_threshold=1, probe_interval=0)
+    breaker.record_failure()
+    probes = []
+
+    async def probe():
+        probes.append(1)
+        if len(probes) < 3:
+            raise ConnectionError("still down")
+
+    async def run():
+        monitor = asyncio.create_task(breaker.monitor(probe))
+        while breaker.is_open:
+            await asyncio.sleep(0)
+        monitor.cancel()
+
+    asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert len(probes) == 3
+    assert breaker.failures == 0
+
+
+def test_connection_failures_are_told_apart():
+    # No statement: the connection could not be opened
+    assert database.is_connection_failure(_error(statement=None))
+    assert database.is_connection_failure(_error(connection_invalidated=True))
+    # A statement failed on a working connection (timeout, lock wait)
+    assert not database.is_connection_failure(_error())
+
+
+def test_only_connection_failures_count(breaker):
+    assert database._operational_error(None, _error()).status_code == 503
+    assert database._operational_error(None, _error(pgcode="57014")).status_code == 504
+    assert breaker.failures == 0
+    assert database._operational_error(None, _error(statement=None)).status_code == 503
+    assert breaker.failures == 1
+
+
+def test_sessions_that_never_connected_are_not_successes(breaker):
+    breaker.record_failure()
+    with database._session_scope(database.SessionLocal):
+        pass  # e.g. answered from the user cache
+    assert breaker.failures == 1
+    with database._session_scope(database.SessionLocal) as db:
+        db.execute(text("SELECT 1"))
+    assert breaker.failures == 0
+
+
+def test_open_breaker_fails_fast(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    with pytest.raises(HTTPException) as error:
+        with database._session_scope(database.SessionLocal):
+            pass
+    assert error.value.status_code == 503
@@ -0,0 +1,105 @@
+import random
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from sqlalchemy import insert
+from app import models
+from app.blood import BLOOD_GROUPS
+from app.matching import DonorIndex, query_matches
+
+TODAY = date(2025, 6, 1)
+
+
+def _row(user_id: str, blood_group: str, city: str = "Lahore", last_donation_date=None, version: int = 1) -> dict:
+    return dict(
+        id=user_id, version=version, updated_at=datetime(2025, 6, 1, tzinfo=timezone.utc),
+        name="Ann", last_name="Lee", email=None, phone_number=user_id, blood_group=blood_group,
+        last_donation_date=last_donation_date, city=city, country="Pakistan",
+    )
+
+
+def _matched(index: DonorIndex, blood_group: str, city: str = "Lahore", limit: int = 50) -> list:
+    return [donor["phone_number"] for donor in index.match(blood_group, city, limit, today=TODAY)]
+
+
+@pytest.fixture
+def index():
+    return DonorIndex()
+
+
+def test_identical_group_first_then_longest_eligible(index):
+    index.upsert(_row("o-neg-recent", "O-", last_donation_date=TODAY - timedelta(days=100)))
+    index.upsert(_row("o-neg-never", "O-"))
+    index.upsert(_row("a-pos-old", "A+", last_donation_date=TODAY - timedelta(days=400)))
+    index.upsert(_row("a-pos-recent", "A+", last_donation_date=TODAY - timedelta(days=95)))
+    index.upsert(_row("a-neg", "A-", last_donation_date=TODAY - timedelta(days=200)))
+    assert _matched(index, "A+") == ["a-pos-old", "a-pos-recent", "a-neg", "o-neg-never", "o-neg-recent"]
+
+
+def test_only_compatible_eligible_donors_in_the_city(index):
+    index.upsert(_row("too-soon", "O-", last_donation_date=TODAY - timedelta(days=89)))
+    index.upsert(_row("eligible-today", "O-", last_donation_date=TODAY - timedelta(days=90)))
+    index.upsert(_row("elsewhere", "O-", city="Karachi"))
+    index.upsert(_row("incompatible", "A+"))
+    assert _matched(index, "O-", city="  LAHORE ") == ["eligible-today"]
+
+
+def test_limit_spans_groups(index):
+    for i in range(3):
+        index.upsert(_row(f"b-pos-{i}", "B+", last_donation_date=TODAY - timedelta(days=300 - i)))
+    index.upsert(_row("o-neg", "O-"))
+    assert _matched(index, "B+", limit=2) == ["b-pos-0", "b-pos-1"]
+    assert _matched(index, "B+", limit=4) == ["b-pos-0", "b-pos-1", "b-pos-2", "o-neg"]
+
+
+def test_upsert_moves_donors_and_ignores_older_versions(index):
+    index.upsert(_row("donor", "O-", version=2))
+    index.upsert(_row("donor", "O-", city="Karachi", version=3))
+    assert _matched(index, "O-") == []
+    assert _matched(index, "O-", city="Karachi") == ["donor"]
+    # A stale write (e.g. a slow reconcile) must not undo the newer one
+    index.upsert(_row("donor", "O-", version=1))
+    assert _matched(index, "O-", city="Karachi") == ["donor"]
+    assert index.versions() == {"donor": 3}
+    assert len(index) == 1
+
+
+def test_remove(index):
+    index.upsert(_row("donor", "O-"))
+    index.remove("donor")
+    index.remove("never-indexed")
+    assert _matched(index, "O-") == []
+    assert len(index) == 0
+
+
+def test_apply_skips_removals_of_donors_written_since(index):
+    index._apply([_row("kept", "O-", version=1), _row("gone", "O-", version=1)])
+    index.upsert(_row("kept", "O-", version=2))
+    # The database snapshot that no longer has either row was taken at version 1
+    index._apply([], removed={"kept": 1, "gone": 1})
+    assert index.versions() == {"kept": 2}
+    assert index.loaded
+
+
+def test_disabled_index_stays_empty():
+    index = DonorIndex(enabled=False)
+    index.upsert(_row("donor", "O-"))
+    assert len(index) == 0
+
+
+def test_index_and_database_rank_alike(db):
+    rng = random.Random(7)
+    rows = [
+        _row(f"donor-{i:03d}", rng.choice(BLOOD_GROUPS), city=rng.choice(("Lahore", "lahore", "Quetta")),
+             last_donation_date=rng.choice((None, TODAY - timedelta(days=rng.randint(1, 400)))))
+        for i in range(300)
+    ]
+    db.execute(insert(models.User.__table__), [
+        dict(row, password="x", registration_date=datetime(2025, 1, 1)) for row in rows])
+    db.commit()
+    index = DonorIndex()
+    for row in rows:
+        index.upsert(row)
+    for blood_group in BLOOD_GROUPS:
+        for city in ("Lahore", "Quetta"):
+            expected = [donor["phone_number"] for donor in query_matches(db, blood_group, city, 20, today=TODAY)]
+            assert _matched(index, blood_group, city, limit=20) == expected
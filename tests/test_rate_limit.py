@@ -0,0 +1,72 @@
+import pytest
+from fastapi import HTTPException
+from app import rate_limit
+from app.rate_limit import InMemoryRateLimitStore, RateLimiter, RateLimitStore
+
+
+@pytest.fixture
+def store():
+    store = InMemoryRateLimitStore(maxsize=100)
+    previous = rate_limit.rate_limit_store
+    rate_limit.set_rate_limit_store(store)
+    yield store
+    rate_limit.set_rate_limit_store(previous)
+
+
+def test_store_is_abstract():
+    with pytest.raises(TypeError):
+        RateLimitStore()
+
+
+def test_bucket_starts_full_then_reports_the_wait(clock):
+    store = InMemoryRateLimitStore(maxsize=100)
+    assert [store.take("k", capacity=3, refill_per_second=1) for _ in range(3)] == [0, 0, 0]
+    assert store.take("k", capacity=3, refill_per_second=1) == pytest.approx(1)
+
+
+def test_tokens_refill_over_time_up_to_capacity(clock):
+    store = InMemoryRateLimitStore(maxsize=100)
+    for _ in range(2):
+        store.take("k", capacity=2, refill_per_second=0.5)
+    clock.advance(1)
+    # Half a token back: the next one is a second away
+    assert store.take("k", capacity=2, refill_per_second=0.5) == pytest.approx(1)
+    clock.advance(1)
+    assert store.take("k", capacity=2, refill_per_second=0.5) == 0
+    clock.advance(3600)
+    assert [store.take("k", capacity=2, refill_per_second=0.5) for _ in range(3)][-1] > 0
+
+
+def test_rejected_takes_do_not_consume(clock):
+    store = InMemoryRateLimitStore(maxsize=100)
+    store.take("k", capacity=1, refill_per_second=1)
+    for _ in range(5):
+        store.take("k", capacity=1, refill_per_second=1)
+    clock.advance(1)
+    assert store.take("k", capacity=1, refill_per_second=1) == 0
+
+
+def test_buckets_are_separate_and_evicted_ones_start_full(clock):
+    store = InMemoryRateLimitStore(maxsize=1)
+    store.take("a", capacity=1, refill_per_second=1)
+    assert store.take("b", capacity=1, refill_per_second=1) == 0
+    # "a" was evicted to make room for "b"
+    assert store.take("a", capacity=1, refill_per_second=1) == 0
+
+
+def test_limiter_raises_429_with_retry_after(store, clock):
+    limiter = RateLimiter("test_429", per_minute=2)
+    limiter.check("client")
+    limiter.check("client")
+    with pytest.raises(HTTPException) as error:
+        limiter.check("client")
+    assert error.value.status_code == 429
+    # Two per minute refill one token every 30 seconds
+    assert error.value.headers["Retry-After"] == "30"
+    limiter.check("another client")
+
+
+def test_zero_limit_disables_the_limiter(store):
+    limiter = RateLimiter("test_disabled", per_minute=0)
+    for _ in range(100):
+        limiter.check("client")
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+from app import models
+from app.routers import user
+
+
+def _donor(i: int, registered: datetime) -> dict:
+    return dict(
+        id=f"user-{i}", name="Ann", last_name="Lee", phone_number=f"0300{i:07d}", blood_group="O+",
+        city="Lahore", country="Pakistan", password="x", registration_date=registered,
+    )
+
+
+def test_cursor_round_trip():
+    row = type("Row", (), {"registration_date": datetime(2025, 3, 1, 12, 30, 15, 123456), "id": "user-7"})
+    cursor = user._encode_cursor(row)
+    assert "=" not in cursor
+    assert user._decode_cursor(cursor) == (row.registration_date, "user-7")
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm90IGpzb24", "WzFd", "WyJub3QgYSBkYXRlIiwgIngiXQ"])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        user._decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_pages_follow_the_keyset_without_gaps_or_repeats(db):
+    start = datetime(2025, 1, 1)
+    # Pairs share a registration_date, so the id decides their order
+    donors = [_donor(i, start + timedelta(seconds=i // 2)) for i in range(7)]
+    db.execute(insert(models.User.__table__), donors)
+    db.commit()
+
+    seen, after = [], None
+    while True:
+        rows = user._list_users(db, 3, after)
+        page = rows[:3]
+        seen.extend(row.id for row in page)
+        if len(rows) <= 3:
+            break
+        after = user._decode_cursor(user._encode_cursor(page[-1]))
+    expected = sorted(donors, key=lambda donor: (donor["registration_date"], donor["id"]), reverse=True)
+    assert seen == [donor["id"] for donor in expected]
+
+
+@pytest.mark.parametrize("header, versions", [
+    (None, None),
+    ("*", None),
+    (' * ', None),
+    ('"3"', [3]),
+    ('"3", "5"', [3, 5]),
+    # If-Match compares strongly: weak and malformed tags never match
+    ('W/"3"', []),
+    ('3', []),
+    ('"abc"', []),
+    ('W/"3", "4"', [4]),
+])
+def test_if_match_versions(header, versions):
+    assert user._if_match_versions(header) == versions
+
+
+def test_update_checks_the_version(db):
+    db.execute(insert(models.User.__table__), [_donor(1, datetime(2025, 1, 1))])
+    db.commit()
+
+    updated = user._update_profile(db, "user-1", {"city": "Multan"}, versions=[1])
+    assert (updated.city, updated.version) == ("Multan", 2)
+    with pytest.raises(HTTPException) as error:
+        user._update_profile(db, "user-1", {"city": "Quetta"}, versions=[1])
+    assert error.value.status_code == 412
+    assert error.value.headers["ETag"] == '"2"'
+    # Any version will do without If-Match; a missing user is None, not a 412
+    assert user._update_profile(db, "user-1", {"city": "Quetta"}).version == 3
+    assert user._update_profile(db, "nobody", {"city": "Quetta"}, versions=[1]) is None